@@ -1,12 +1,15 @@
 import streamlit as st
 import pandas as pd
-import altair as alt
-import os
 from datetime import datetime
 
-# -------------------------------
-# File to store persistent transfer requests
-TRANSFER_FILE = "transfer_requests.csv"
+from assets import logo_bytes
+from ingest import upload_id
+from inventory_cache import SHARED_CACHE, DEFAULT_MARKET, cached_inventory, publish_inventory
+from transfer_store import init_store, migrate_csv, add_transfer, transition, versions, list_transfers
+from profiling_views import instrumented_rerun, profiling_panel
+from transfer_views import transfer_filters, paged_transfers, bulk_approval, paged_dataframe
+from metrics import metrics_for
+from profiling import timed
 
 # -------------------------------
 # Sample user credentials
@@ -21,19 +24,24 @@ if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
 if 'role' not in st.session_state:
     st.session_state.role = None
-if 'inventory_data' not in st.session_state:
-    st.session_state.inventory_data = pd.DataFrame()
-if 'transfer_requests' not in st.session_state:
-    if os.path.exists(TRANSFER_FILE):
-        st.session_state.transfer_requests = pd.read_csv(TRANSFER_FILE).to_dict('records')
-    else:
-        st.session_state.transfer_requests = []
 
 # -------------------------------
-# Helper to save transfer requests
-def save_transfer_requests():
-    df = pd.DataFrame(st.session_state.transfer_requests)
-    df.to_csv(TRANSFER_FILE, index=False)
+# One-time setup of the transfer store (imports the legacy CSV if present)
+@st.cache_resource
+def setup_transfer_store():
+    init_store()
+    migrate_csv()
+
+setup_transfer_store()
+
+# -------------------------------
+# Inventory is shared by all sessions through the process-wide cache,
+# backed by a columnar snapshot of the last upload
+INVENTORY_SNAPSHOT = "inventory"
+
+def get_inventory(columns=None):
+    df = cached_inventory(INVENTORY_SNAPSHOT, columns=columns)
+    return pd.DataFrame() if df is None else df
 
 # -------------------------------
 # Login screen
@@ -42,6 +50,7 @@ def login():
     email = st.text_input("Email")
     password = st.text_input("Password", type="password")
     if st.button("Login"):
+        # Only this app's own accounts can log in here
         user = users.get(email)
         if user and user["password"] == password:
             st.session_state.logged_in = True
@@ -53,7 +62,7 @@ def login():
 # Sidebar Navigation
 def sidebar():
     with st.sidebar:
-        st.image("https://upload.wikimedia.org/wikipedia/commons/2/20/Adidas_Logo.svg", width=100)
+        st.image(logo_bytes(), width=100)
         st.markdown(f"**Role:** {st.session_state.role}")
         nav = st.radio("Navigate", [
             "Dashboard",
@@ -73,34 +82,46 @@ def sidebar():
 # Dashboard
 def dashboard():
     st.subheader("Dashboard")
-    if st.session_state.inventory_data.empty:
+    df = get_inventory()
+    if df.empty:
         st.warning("Upload inventory data first.")
         return
 
-    df = st.session_state.inventory_data
     st.write("### Inventory Summary")
-    st.dataframe(df)
-
-    chart = alt.Chart(df).mark_bar().encode(
-        x='Product',
-        y='Stock Qty',
-        color='Status'
-    ).properties(width=600)
-    st.altair_chart(chart)
-
-    if st.session_state.transfer_requests:
-        st.write("### All Transfer Requests")
-        df_requests = pd.DataFrame(st.session_state.transfer_requests)
+    charted = {"Product", "Status", "Stock Qty"} <= set(df.columns)
+    if charted:
+        # Charts and totals come from shared pre-aggregated metrics, not from every row
+        metrics = metrics_for(DEFAULT_MARKET, SHARED_CACHE.version(DEFAULT_MARKET), df)
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Rows", f"{metrics.rows:,}")
+        col2.metric("Products", f"{len(metrics.by_product()):,}")
+        col3.metric("Units in Stock", f"{int(metrics.by_product().sum()):,}")
+    paged_dataframe("inventory", df)
+
+    if charted:
+        import altair as alt   # only sessions that open the dashboard pay for the import
+        chart = alt.Chart(metrics.chart_data()).mark_bar().encode(
+            x='Product',
+            y='Stock Qty',
+            color='Status'
+        ).properties(width=600)
+        st.altair_chart(chart)
+
+    st.write("### All Transfer Requests")
+    transfer_requests = paged_transfers("dashboard")
+    if transfer_requests:
+        df_requests = pd.DataFrame(transfer_requests)
         st.dataframe(df_requests)
 
 # -------------------------------
 # Manage Inventory
 def manage_inventory():
     st.subheader("Manage Inventory")
-    if st.session_state.inventory_data.empty:
+    df = get_inventory()
+    if df.empty:
         st.warning("No inventory data loaded.")
         return
-    st.dataframe(st.session_state.inventory_data)
+    paged_dataframe("manage", df)
 
 # -------------------------------
 # Submit Transfer
@@ -116,14 +137,13 @@ def submit_transfer():
     if st.button("Submit"):
         request = {
             "SKU": sku,
-            "Quantity": qty,
+            "Qty": qty,
             "From": from_loc,
             "To": to_loc,
             "Status": "Pending",
             "Submitted At": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
-        st.session_state.transfer_requests.append(request)
-        save_transfer_requests()
+        add_transfer(request)
         st.success(f"Transfer of {qty} units from {from_loc} to {to_loc} submitted for SKU {sku}.")
 
 # -------------------------------
@@ -131,44 +151,27 @@ def submit_transfer():
 def approvals():
     st.subheader("Transfer Approvals")
 
-    if not st.session_state.transfer_requests:
-        st.info("No transfer requests found.")
-        return
-
-    df = pd.DataFrame([r for r in st.session_state.transfer_requests if r["Status"] != "Received"])
+    filters = transfer_filters("approvals")
 
     # Pending Requests
-    pending = df[df["Status"] == "Pending"]
-    if not pending.empty:
-        st.write("### ⏳ Pending Requests")
-        for i, req in pending.iterrows():
-            with st.expander(f"{req['SKU']} - {req['Quantity']} units from {req['From']} to {req['To']}"):
-                st.write(f"**Submitted At:** {req['Submitted At']}")
-                col1, col2 = st.columns(2)
-                if col1.button(f"Approve Request {i+1}"):
-                    st.session_state.transfer_requests[i]["Status"] = "Approved"
-                    save_transfer_requests()
-                    st.success(f"Request {i+1} approved.")
-                    st.rerun()
-                if col2.button(f"Deny Request {i+1}"):
-                    st.session_state.transfer_requests[i]["Status"] = "Denied"
-                    save_transfer_requests()
-                    st.error(f"Request {i+1} denied.")
-                    st.rerun()
+    st.write("### ⏳ Pending Requests")
+    pending = paged_transfers("pending", status="Pending", **filters)
+    if pending:
+        bulk_approval("pending", pending)
     else:
         st.info("No pending requests.")
 
     # Approved Requests
-    approved = df[df["Status"] == "Approved"]
-    if not approved.empty:
-        st.write("### ✅ Approved Requests")
-        st.dataframe(approved)
+    st.write("### ✅ Approved Requests")
+    approved = paged_transfers("approved", status="Approved", **filters)
+    if approved:
+        st.dataframe(pd.DataFrame(approved))
 
     # Denied Requests
-    denied = df[df["Status"] == "Denied"]
-    if not denied.empty:
-        st.write("### ❌ Denied Requests")
-        st.dataframe(denied)
+    st.write("### ❌ Denied Requests")
+    denied = paged_transfers("denied", status="Denied", **filters)
+    if denied:
+        st.dataframe(pd.DataFrame(denied))
 
 # -------------------------------
 # Receive Inventory
@@ -176,7 +179,7 @@ def receive_inventory():
     st.subheader("Receive Inventory")
 
     # Filter only approved transfers
-    approved_transfers = [req for req in st.session_state.transfer_requests if req["Status"] == "Approved"]
+    approved_transfers = paged_transfers("receive", status="Approved")
 
     if not approved_transfers:
         st.info("No approved transfers available for receiving.")
@@ -186,11 +189,8 @@ def receive_inventory():
     st.dataframe(df)
 
     if st.button("Mark as Received"):
-        for req in st.session_state.transfer_requests:
-            if req["Status"] == "Approved":
-                req["Status"] = "Received"
-        save_transfer_requests()
-        st.success("Approved inventory marked as received.")
+        moved, _ = transition(versions(list_transfers(status="Approved")), "Received")
+        st.success(f"{len(moved)} approved transfer(s) marked as received.")
         st.rerun()
 
 # -------------------------------
@@ -199,10 +199,15 @@ def upload_csv():
     st.subheader("Upload Inventory CSV")
     uploaded = st.file_uploader("Choose a CSV file", type="csv")
     if uploaded:
-        df = pd.read_csv(uploaded)
-        st.session_state.inventory_data = df
+        # Identified by content: a new export under the same name and size is loaded again
+        if SHARED_CACHE.source(DEFAULT_MARKET) != upload_id(uploaded):
+            with timed("ingest: read csv") as span:
+                df = pd.read_csv(uploaded)
+                span["rows"] = len(df)
+            publish_inventory(df, INVENTORY_SNAPSHOT, source=upload_id(uploaded))
+        df = get_inventory()
         st.success("Data loaded successfully.")
-        st.dataframe(df)
+        paged_dataframe("upload", df)
 
 # -------------------------------
 # Main Routing
@@ -210,15 +215,17 @@ if not st.session_state.logged_in:
     login()
 else:
     page = sidebar()
-    if page == "Dashboard":
-        dashboard()
-    elif page == "Manage Inventory":
-        manage_inventory()
-    elif page == "Submit Transfer":
-        submit_transfer()
-    elif page == "Approvals" and st.session_state.role == "Approver":
-        approvals()
-    elif page == "Receive Inventory":
-        receive_inventory()
-    elif page == "Upload CSV":
-        upload_csv()
+    with instrumented_rerun(page):
+        if page == "Dashboard":
+            dashboard()
+        elif page == "Manage Inventory":
+            manage_inventory()
+        elif page == "Submit Transfer":
+            submit_transfer()
+        elif page == "Approvals" and st.session_state.role == "Approver":
+            approvals()
+        elif page == "Receive Inventory":
+            receive_inventory()
+        elif page == "Upload CSV":
+            upload_csv()
+    profiling_panel()
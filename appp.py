@@ -1,9 +1,22 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import os
-
-TRANSFER_FILE = "transfer_requests.csv"
+from assets import logo_bytes
+from ingest import upload_id
+from suggestions import SUGGESTION_INDEX
+from optimizer import plan_for
+from inventory_cache import (SHARED_CACHE, DEFAULT_MARKET, cached_inventory, inventory_loaded, market_lock,
+                             publish_inventory)
+from job_views import job_progress
+from jobs import init_jobs, ingest_job, submit_job
+from receiving import receive_approved
+from snapshots import snapshot_version
+from sizes import size_model_for, suggest_sizes
+from store_index import advance_partitions, partitions_for
+from transfer_store import (init_store, migrate_csv, add_transfer, inventory_source, load_store_inventory,
+                            save_inventory)
+from profiling_views import instrumented_rerun, profiling_panel
+from transfer_views import transfer_filters, paged_transfers, bulk_approval, paged_dataframe
 
 # ------------------ USER SETUP ---------------------
 users = {
@@ -19,20 +32,43 @@ for key, val in {
     "role": None,
     "user_store": None,
     "user_email": None,
-    "inventory_data": pd.DataFrame(),
     "suggested_transfer": None
 }.items():
     if key not in st.session_state:
         st.session_state[key] = val
 
-if "transfer_requests" not in st.session_state:
-    if os.path.exists(TRANSFER_FILE):
-        st.session_state.transfer_requests = pd.read_csv(TRANSFER_FILE).to_dict('records')
-    else:
-        st.session_state.transfer_requests = []
+@st.cache_resource
+def setup_transfer_store():
+    init_store()
+    migrate_csv()
+    init_jobs()
+
+setup_transfer_store()
 
-def save_transfer_requests():
-    pd.DataFrame(st.session_state.transfer_requests).to_csv(TRANSFER_FILE, index=False)
+# Inventory is shared by all sessions through the process-wide cache,
+# backed by a columnar snapshot of the last upload
+INVENTORY_SNAPSHOT = "store_inventory"
+DASHBOARD_COLUMNS = ["Store", "SKU", "Product", "Stock Qty", "Sales Last Week"]
+
+def get_inventory(columns=None):
+    df = cached_inventory(INVENTORY_SNAPSHOT, columns=columns)
+    return pd.DataFrame() if df is None else df
+
+def store_inventory(store):
+    # A manager's own rows: a slice of the partitioned in-memory inventory when
+    # the current snapshot is loaded, else read from the store-indexed table when
+    # it mirrors that snapshot, without loading the market. None when no
+    # inventory has been uploaded; accounts without a store get no rows.
+    if store is None:
+        df = get_inventory(DASHBOARD_COLUMNS)
+        return None if df.empty else df.iloc[:0]
+    version = snapshot_version(INVENTORY_SNAPSHOT)
+    if not inventory_loaded(INVENTORY_SNAPSHOT) and version is not None and inventory_source() == version:
+        return load_store_inventory(store)
+    df = get_inventory()
+    if df.empty:
+        return None
+    return partitions_for(DEFAULT_MARKET, SHARED_CACHE.version(DEFAULT_MARKET), df).slice(store)
 
 # ------------------ LOGIN --------------------------
 def login():
@@ -40,20 +76,23 @@ def login():
     email = st.text_input("Email")
     password = st.text_input("Password", type="password")
     if st.button("Login"):
+        # Only this app's own accounts; a store manager must have a store to scope their pages
         user = users.get(email)
-        if user and user["password"] == password:
+        if not user or user["password"] != password:
+            st.error("Invalid credentials")
+        elif user["role"] == "Store Manager" and not user.get("store"):
+            st.error("This account has no store assigned")
+        else:
             st.session_state.logged_in = True
             st.session_state.role = user["role"]
             st.session_state.user_store = user.get("store", None)
             st.session_state.user_email = email
             st.rerun()
-        else:
-            st.error("Invalid credentials")
 
 # ------------------ SIDEBAR ------------------------
 def sidebar():
     with st.sidebar:
-        st.image("https://upload.wikimedia.org/wikipedia/commons/2/20/Adidas_Logo.svg", width=100)
+        st.image(logo_bytes(), width=100)
         st.markdown(f"**Logged in as:** `{st.session_state.user_email}`")
         if st.session_state.user_store:
             st.markdown(f"**Store:** {st.session_state.user_store}")
@@ -75,58 +114,65 @@ def upload_inventory():
     sales_file = st.file_uploader("Sales CSV", type="csv", key="sales")
 
     if inv_file and sales_file:
-        inv_df = pd.read_csv(inv_file)
-        sales_df = pd.read_csv(sales_file)
-        merged = pd.merge(inv_df, sales_df, on=["Store", "SKU"], how="left")
-        merged["Sales Last Week"].fillna(0, inplace=True)
-        st.session_state.inventory_data = merged
+        # Identified by content: a new export under the same names and sizes is ingested again
+        upload = (upload_id(inv_file), upload_id(sales_file))
+        if SHARED_CACHE.source(DEFAULT_MARKET) != upload:
+            # Merged in the background; the same upload from two sessions is ingested once
+            job_id = submit_job("ingest", upload, ingest_job, inv_file, sales_file, INVENTORY_SNAPSHOT,
+                                source=upload, submitted_by=st.session_state.user_email, reuse=False)
+            job = job_progress(job_id)
+            if job is None or job["status"] != "Done":
+                return
+        merged = get_inventory()
         st.success("Data uploaded successfully.")
         st.dataframe(merged)
 
 # ------------------ DASHBOARD ----------------------
 def dashboard():
     st.subheader("Dashboard")
-    df = st.session_state.inventory_data
-    if df.empty:
+    df = store_inventory(st.session_state.user_store)
+    if df is None:
         st.info("Upload inventory to see dashboard.")
     else:
-        st.dataframe(df[df["Store"] == st.session_state.user_store])
+        st.dataframe(df)
 
 # ------------------ TRANSFER SUGGESTIONS ------------
 def transfer_suggestions():
     st.subheader("Smart Transfer Suggestions")
-    df = st.session_state.inventory_data
+    df = get_inventory()
     if df.empty:
         st.warning("Upload inventory first.")
         return
 
-    sku_groups = df.groupby("SKU")
-    suggestions = []
-
-    for sku, group in sku_groups:
-        sorted_group = group.sort_values(by="Sales Last Week")
-        if len(sorted_group) >= 2:
-            from_store = sorted_group.iloc[0]
-            to_store = sorted_group.iloc[-1]
-            if from_store["Sales Last Week"] < to_store["Sales Last Week"]:
-                qty = min(10, from_store["Stock Qty"])
-                suggestions.append({
-                    "SKU": sku,
-                    "Product": from_store["Product"],
-                    "From": from_store["Store"],
-                    "To": to_store["Store"],
-                    "Qty": qty,
-                    "Submitted At": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "Status": "Suggested"
-                })
-
-    if suggestions:
+    modes = ["Quick", "Optimized (greedy)", "Optimized (min cost)"]
+    if {"Style", "Size"}.issubset(df.columns):
+        modes.append("Size level")
+    mode = st.radio("Suggestion Mode", modes, horizontal=True)
+    if mode == "Quick":
+        # Only SKUs touched since the last visit are recomputed
+        suggestions = SUGGESTION_INDEX.suggestions(df, SHARED_CACHE.version(DEFAULT_MARKET))
+    elif mode == "Size level":
+        # Per EAN, keeping pivotal sizes on the donor's shelf
+        suggestions = suggest_sizes(size_model_for(DEFAULT_MARKET, SHARED_CACHE.version(DEFAULT_MARKET), df))
+    else:
+        # Planned once per inventory version and solver, shared by every session
+        solver = "greedy" if mode == "Optimized (greedy)" else "mincost"
+        suggestions, shipments = plan_for(DEFAULT_MARKET, SHARED_CACHE.version(DEFAULT_MARKET), df, solver)
+        if not shipments.empty:
+            shipped = shipments[shipments["Decision"] == "Ship"]
+            st.write(f"### Shipments ({len(shipped)} of {len(shipments)} corridors)")
+            st.dataframe(shipments, hide_index=True)
+
+    if not suggestions.empty:
         st.write("### Suggested Transfers")
-        for row in suggestions:
-            st.markdown(f"**{row['SKU']}**: Suggest transferring {row['Qty']} from {row['From']} → {row['To']}")
-            if st.button(f"Submit {row['SKU']}", key=row['SKU'] + row['From']):
-                st.session_state.suggested_transfer = row
-                st.rerun()
+        # One page is rendered; a line from it is picked for the Submit Transfer form
+        page = paged_dataframe("suggestions", suggestions)
+        rows = page.to_dict("records")
+        choice = st.selectbox("Transfer to submit", range(len(rows)),
+                              format_func=lambda i: f"{rows[i]['SKU']}: {rows[i]['Qty']} from {rows[i]['From']} → {rows[i]['To']}")
+        if st.button("Submit selected"):
+            st.session_state.suggested_transfer = rows[choice]
+            st.rerun()
     else:
         st.info("No suggestions found.")
 
@@ -143,7 +189,7 @@ def submit_transfer():
 
     if st.button("Submit Transfer"):
         if sku and from_loc != to_loc:
-            st.session_state.transfer_requests.append({
+            add_transfer({
                 "SKU": sku,
                 "Qty": qty,
                 "From": from_loc,
@@ -153,7 +199,6 @@ def submit_transfer():
                 "Submitted At": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 "Submitted By": st.session_state.user_email
             })
-            save_transfer_requests()
             st.session_state.suggested_transfer = None
             st.success("Transfer submitted.")
         else:
@@ -162,31 +207,32 @@ def submit_transfer():
 # ------------------ APPROVALS -----------------------
 def approvals():
     st.subheader("Transfer Approvals")
-    pending = [r for r in st.session_state.transfer_requests if r["Status"] == "Pending"]
+    filters = transfer_filters("approvals")
+    pending = paged_transfers("pending", status="Pending", **filters)
     if not pending:
         st.info("No pending approvals.")
         return
 
-    for i, row in enumerate(pending):
-        with st.expander(f"{row['SKU']} - {row['Qty']} from {row['From']} to {row['To']}"):
-            st.markdown(f"Submitted by: `{row.get('Submitted By', 'N/A')}`")
-            col1, col2 = st.columns(2)
-            if col1.button("Approve", key=f"approve_{i}"):
-                row["Status"] = "Approved"
-                save_transfer_requests()
-                st.success("Approved")
-                st.rerun()
-            if col2.button("Deny", key=f"deny_{i}"):
-                row["Status"] = "Denied"
-                save_transfer_requests()
-                st.error("Denied")
-                st.rerun()
+    bulk_approval("pending", pending)
 
 # ------------------ RECEIVE INVENTORY ---------------
 def receive_inventory():
     st.subheader("Receive Inventory")
-    approved = [r for r in st.session_state.transfer_requests 
-                if r["Status"] == "Approved" and r["To"] == st.session_state.user_store]
+    store = st.session_state.user_store
+    inbound, outbound = st.tabs(["Inbound", "Outbound"])
+    with outbound:
+        # This store's own shipments, read through the from_location index
+        sent = paged_transfers("outbound", from_location=store)
+        if sent:
+            st.dataframe(pd.DataFrame(sent))
+        else:
+            st.info("No outbound transfers.")
+
+    with inbound:
+        receive_inbound(store)
+
+def receive_inbound(store):
+    approved = paged_transfers("receive", status="Approved", to_location=store)
 
     if not approved:
         st.info("No transfers to receive.")
@@ -195,31 +241,20 @@ def receive_inventory():
     st.dataframe(pd.DataFrame(approved))
 
     if st.button("Mark as Received"):
-        if st.session_state.inventory_data.empty:
-            st.session_state.inventory_data = pd.DataFrame(columns=["Store", "SKU", "Product", "Stock Qty", "Sales Last Week"])
-
-        for r in approved:
-            r["Status"] = "Received"
-            match = (
-                (st.session_state.inventory_data["Store"] == r["To"]) &
-                (st.session_state.inventory_data["SKU"] == r["SKU"])
-            )
-
-            if match.any():
-                st.session_state.inventory_data.loc[match, "Stock Qty"] += int(r["Qty"])
-            else:
-                new_row = {
-                    "Store": r["To"],
-                    "SKU": r["SKU"],
-                    "Product": r["Product"],
-                    "Stock Qty": int(r["Qty"]),
-                    "Sales Last Week": 0
-                }
-                st.session_state.inventory_data = pd.concat([
-                    st.session_state.inventory_data, pd.DataFrame([new_row])
-                ], ignore_index=True)
-
-        save_transfer_requests()
+        # Read, apply and publish under the market lock and the receive transaction:
+        # a concurrent receive (another session or the batch CLI) starts from this
+        # result instead of overwriting it
+        def publish(inventory, received, conn):
+            previous = SHARED_CACHE.version(DEFAULT_MARKET)
+            before = snapshot_version(INVENTORY_SNAPSHOT)
+            version = publish_inventory(inventory, INVENTORY_SNAPSHOT, source=SHARED_CACHE.source(DEFAULT_MARKET))
+            SUGGESTION_INDEX.touch((r["SKU"] for r in received), previous, version)
+            advance_partitions(DEFAULT_MARKET, previous, version, inventory)
+            save_inventory(partitions_for(DEFAULT_MARKET, version, inventory).slice(store), stores=[store], conn=conn,
+                           source=snapshot_version(INVENTORY_SNAPSHOT), based_on=before)
+
+        with market_lock(DEFAULT_MARKET):
+            receive_approved(get_inventory, publish, store)
         st.success("Inventory updated for received items.")
         st.rerun()
 
@@ -228,15 +263,17 @@ if not st.session_state.logged_in:
     login()
 else:
     page = sidebar()
-    if page == "Dashboard":
-        dashboard()
-    elif page == "Upload Inventory":
-        upload_inventory()
-    elif page == "Transfer Suggestions":
-        transfer_suggestions()
-    elif page == "Submit Transfer":
-        submit_transfer()
-    elif page == "Approvals" and st.session_state.role == "Approver":
-        approvals()
-    elif page == "Receive Inventory":
-        receive_inventory()
+    with instrumented_rerun(page):
+        if page == "Dashboard":
+            dashboard()
+        elif page == "Upload Inventory":
+            upload_inventory()
+        elif page == "Transfer Suggestions":
+            transfer_suggestions()
+        elif page == "Submit Transfer":
+            submit_transfer()
+        elif page == "Approvals" and st.session_state.role == "Approver":
+            approvals()
+        elif page == "Receive Inventory":
+            receive_inventory()
+    profiling_panel()
@@ -0,0 +1,59 @@
+import base64
+from functools import lru_cache
+from pathlib import Path
+
+# Static files live next to the apps, so nothing is fetched over the network
+ASSET_DIR = Path(__file__).resolve().parent
+LOGO_FILE = ASSET_DIR / "Adidas_Logo.svg.png"
+
+APP_CSS = """
+    <style>
+        .stButton>button {
+            border-radius: 8px;
+            background-color: #000000;
+            color: white;
+            padding: 0.6em 1.2em;
+            margin: 0.5em;
+            font-weight: 600;
+        }
+        .stRadio > div {
+            padding: 1em;
+            border: 1px solid #eee;
+            border-radius: 10px;
+        }
+        h1, h2, h3 {
+            color: #000000;
+            font-family: 'Helvetica Neue', sans-serif;
+        }
+        .css-1d391kg {
+            overflow-x: auto;
+        }
+        .stDataFrame {
+            overflow-x: auto;
+            width: 100% !important;
+            word-break: break-word;
+        }
+    </style>
+"""
+
+
+# ------------------ CACHED ASSETS -------------------
+# Read and encoded once per server process; reruns reuse the same objects
+@lru_cache(maxsize=None)
+def logo_bytes():
+    return LOGO_FILE.read_bytes()
+
+
+@lru_cache(maxsize=None)
+def logo_base64():
+    return base64.b64encode(logo_bytes()).decode()
+
+
+@lru_cache(maxsize=None)
+def header_html(title, width=150):
+    return f"""
+    <div style="text-align:center;">
+        <img src="data:image/png;base64,{logo_base64()}" width="{width}"/>
+        <h1 style="font-family:Arial, sans-serif; margin-top:10px;">{title}</h1>
+    </div>
+    """
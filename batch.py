@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from ingest import ingest
+from pipeline import run_pipeline
+from snapshots import save_snapshot
+
+MARKETS = ["Germany", "France", "UK"]
+
+
+# ------------------ SNAPSHOT NAMES ------------------
+# Shared with the Streamlit apps, which display what the nightly run produced
+def inventory_snapshot(market):
+    return f"inventory_{market}"
+
+
+def recommendations_snapshot(market):
+    return f"recommendations_{market}"
+
+
+# ------------------ ONE MARKET ----------------------
+def run_market(market, inventory_file, sales_file, solver="greedy", export_dir=None):
+    # Ingest -> pipeline -> export for one market, timing every stage
+    timings = {}
+
+    start = time.perf_counter()
+    with open(inventory_file, "rb") as inv, open(sales_file, "rb") as sales:
+        inventory = ingest(inv, sales)
+    save_snapshot(inventory, inventory_snapshot(market))
+    timings["ingest"] = time.perf_counter() - start
+
+    # Markets already run in parallel, so stages run inline inside each worker
+    result = run_pipeline(inventory, max_workers=1, solver=solver)
+    timings.update(result["timings"]["All"])
+    recommendations = result["recommendations"]
+
+    start = time.perf_counter()
+    save_snapshot(recommendations, recommendations_snapshot(market))
+    if export_dir:
+        os.makedirs(export_dir, exist_ok=True)
+        recommendations.to_csv(os.path.join(export_dir, f"{market}_recommendations.csv"), index=False)
+    timings["export"] = time.perf_counter() - start
+
+    return {"market": market, "rows": len(inventory), "transfers": len(recommendations), "timings": timings}
+
+
+# ------------------ ENTRY POINT ---------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nightly store-to-store consolidation run for one or more markets.")
+    parser.add_argument("--markets", nargs="+", default=MARKETS, help="markets to run")
+    parser.add_argument("--inventory", default="data/{market}_inventory.csv",
+                        help="inventory CSV path; {market} is replaced by the market name")
+    parser.add_argument("--sales", default="data/{market}_sales.csv",
+                        help="sales CSV path; {market} is replaced by the market name")
+    parser.add_argument("--solver", default="greedy", help="optimizer solver (greedy or mincost)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--export-dir", default=None, help="also write recommendations as CSV here")
+    parser.add_argument("--report", default=None, help="write per-stage timings as JSON to this file")
+    args = parser.parse_args(argv)
+
+    jobs = [(m, args.inventory.format(market=m), args.sales.format(market=m)) for m in args.markets]
+    missing = [path for _, inv, sales in jobs for path in (inv, sales) if not os.path.exists(path)]
+    if missing:
+        parser.error(f"missing input files: {', '.join(missing)}")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(run_market, m, inv, sales, args.solver, args.export_dir) for m, inv, sales in jobs]
+        reports = [future.result() for future in futures]
+
+    for report in reports:
+        total = sum(report["timings"].values())
+        print(f"{report['market']}: {report['rows']} inventory rows -> {report['transfers']} transfers in {total:.2f}s")
+        for stage, seconds in report["timings"].items():
+            print(f"    {stage:<12} {seconds:8.3f}s")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from health import HealthEngine
+from ingest import ingest
+from receiving import apply_receipts
+from sizes import build_size_model, suggest_sizes
+from snapshots import load_snapshot, save_snapshot
+from suggestions import compute_suggestions
+from transfer_store import (add_transfer, add_transfers, connect, count_transfers, init_store, list_transfers,
+                            load_store_inventory, query_transfers, save_inventory, transition,
+                            update_statuses, versions)
+
+# Timings are machine-specific, so the baseline is not committed (see .gitignore).
+# Record one on the machine that runs the comparison:  python benchmark.py --save-baseline
+BASELINE_FILE = "benchmark_baseline.json"
+TOLERANCE = 0.25          # slower or hungrier than the baseline by more than this is a regression
+
+SIZE_CURVE = np.array([1, 3, 6, 9, 9, 6, 3, 1], dtype="float64")
+BRANDS = ["ADIDAS", "ORIGINALS"]
+SPORTS = ["RUNNING", "FOOTBALL/SOCCER", "TRAINING", "TENNIS", "BASKETBALL", "ORIGINALS"]
+
+
+# ------------------ SYNTHETIC MARKET ----------------
+def synthetic_market(stores=200, styles=300, sizes=8, seed=0):
+    # Deterministic store x style x size inventory. Store and style popularity
+    # follow Zipf-like curves and sizes follow a bell-shaped size curve, so a
+    # few stores and styles carry most of the sales, like a real market.
+    rng = np.random.default_rng(seed)
+    store, style, size = (a.ravel() for a in np.meshgrid(np.arange(stores), np.arange(styles), np.arange(sizes),
+                                                        indexing="ij"))
+    store_weight = 1.0 / (1 + rng.permutation(stores)) ** 0.8
+    style_weight = 1.0 / (1 + rng.permutation(styles)) ** 1.1
+    curve = np.interp(np.linspace(0, len(SIZE_CURVE) - 1, sizes), np.arange(len(SIZE_CURVE)), SIZE_CURVE)
+    rate = store_weight[store] * style_weight[style] * curve[size]
+    rate *= 2.0 * len(rate) / rate.sum()                # about two units per row per week
+
+    style_names = np.char.add("ST", np.char.zfill(np.arange(styles).astype(str), 5))
+    return pd.DataFrame({
+        "Store": np.char.add("S", np.char.zfill(store.astype(str), 4)),
+        "SKU": (4060000000000 + style * 100 + size).astype(str),
+        "Product": style_names[style],
+        "Style": style_names[style],
+        "Size": 36 + size,
+        "Brand": np.array(BRANDS)[style % len(BRANDS)],
+        "Sport": np.array(SPORTS)[style % len(SPORTS)],
+        "Stock Qty": rng.poisson(3, len(rate)).astype("int32"),
+        "Sales Last Week": rng.poisson(rate).astype("int32"),
+    })
+
+
+def sales_lines(inventory, seed=0):
+    # Raw sales file for ingest: each (Store, SKU) total split over two lines
+    rng = np.random.default_rng(seed)
+    sold = inventory[inventory["Sales Last Week"] > 0]
+    first = rng.binomial(sold["Sales Last Week"].to_numpy(), 0.5)
+    lines = pd.concat([
+        sold[["Store", "SKU"]].assign(**{"Sales Last Week": first}),
+        sold[["Store", "SKU"]].assign(**{"Sales Last Week": sold["Sales Last Week"].to_numpy() - first}),
+    ])
+    return lines.sample(frac=1.0, random_state=seed)
+
+
+# ------------------ HOT PATHS -----------------------
+# Each benchmark takes the market (plus scratch state) and returns the rows it processed
+def bench_suggest(market, state):
+    compute_suggestions(market)
+    return len(market)
+
+
+def bench_suggest_sizes(market, state):
+    suggest_sizes(build_size_model(market))
+    return len(market)
+
+
+def bench_ingest(market, state):
+    with open(state["inventory_csv"], "rb") as inv, open(state["sales_csv"], "rb") as sales:
+        ingest(inv, sales)
+    return len(market)
+
+
+def bench_receive(market, state):
+    apply_receipts(market, state["transfers"])
+    return len(state["transfers"])
+
+
+def bench_persistence(market, state):
+    # Snapshot round trip plus one bulk status change in the transfer database
+    save_snapshot(market, "benchmark")
+    load_snapshot("benchmark")
+    update_statuses(state["transfer_ids"], "Approved", db_file=state["db_file"])
+    return len(market) + len(state["transfer_ids"])
+
+
+def bench_health(market, state):
+    HealthEngine(market, max_workers=1).report(state["transfers"])
+    return len(market)
+
+
+def simulate_sessions(stores, db_file, sessions=32, actions=20):
+    # Concurrent Streamlit-like sessions, one thread each, all sharing the
+    # process connection pool: read their store, page and submit transfers
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def session(i):
+        store = stores[i % len(stores)]
+        for n in range(actions):
+            start = time.perf_counter()
+            try:
+                load_store_inventory(store, db_file=db_file)
+                query_transfers(page=0, store=store, db_file=db_file)
+                transfer_id = add_transfer({"SKU": f"SIM{i}-{n}", "Qty": 1, "From": store,
+                                            "To": stores[(i + 1) % len(stores)]}, db_file=db_file)
+                transition([transfer_id], "Approved", db_file=db_file)
+            except sqlite3.Error as e:
+                with lock:
+                    errors.append(repr(e))
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        list(pool.map(session, range(sessions)))
+    return {"actions": len(latencies), "errors": errors,
+            "p50_ms": 1000 * float(np.percentile(latencies, 50)), "p95_ms": 1000 * float(np.percentile(latencies, 95))}
+
+
+def bench_sessions(market, state):
+    result = simulate_sessions(state["stores"], state["db_file"])
+    if result["errors"]:
+        raise RuntimeError(f"{len(result['errors'])} session errors, first: {result['errors'][0]}")
+    return result["actions"]
+
+
+def simulate_approvers(db_file, approvers=32, transfers=2000, page_size=25, seed=0):
+    # Dozens of approvers working the same pending queue at once. Each reads a
+    # page (overlapping the others), then compare-and-swaps a decision on it;
+    # every request must end up decided exactly once, by the approver who won.
+    add_transfers([{"SKU": f"APPROVE{n}", "Qty": 1, "From": "A", "To": "B", "Submitted By": "benchmark"}
+                   for n in range(transfers)], db_file=db_file)
+    decided, errors = {}, []
+    conflicts = 0
+    lock = threading.Lock()
+
+    def approver(i):
+        nonlocal conflicts
+        rng = np.random.default_rng(seed + i)
+        while True:
+            page = (query_transfers(page=int(rng.integers(0, 3)), page_size=page_size, status="Pending", db_file=db_file)
+                    or query_transfers(page=0, page_size=page_size, status="Pending", db_file=db_file))
+            if not page:
+                return
+            status = "Approved" if rng.random() < 0.8 else "Denied"
+            try:
+                moved, lost = transition(versions(page), status, db_file=db_file)
+            except sqlite3.Error as e:
+                with lock:
+                    errors.append(repr(e))
+                return
+            with lock:
+                conflicts += len(lost)
+                for transfer_id in moved:
+                    if transfer_id in decided:
+                        errors.append(f"transfer {transfer_id} decided twice")
+                    decided[transfer_id] = status
+
+    with ThreadPoolExecutor(max_workers=approvers) as pool:
+        list(pool.map(approver, range(approvers)))
+
+    # The decision each winner was told about must be the one stored
+    stored = {r["ID"]: r["Status"] for r in list_transfers(db_file=db_file) if r["ID"] in decided}
+    errors += [f"transfer {i} stored as {stored[i]}, decided {s}" for i, s in decided.items() if stored[i] != s]
+    pending = count_transfers(status="Pending", db_file=db_file)
+    if pending:
+        errors.append(f"{pending} transfers left pending")
+    return {"decisions": len(decided), "conflicts": conflicts, "errors": errors}
+
+
+def bench_approvals(market, state):
+    result = simulate_approvers(state["db_file"])
+    if result["errors"]:
+        raise RuntimeError(f"{len(result['errors'])} approval errors, first: {result['errors'][0]}")
+    return result["decisions"]
+
+
+BENCHMARKS = {
+    "suggest": bench_suggest,
+    "suggest_sizes": bench_suggest_sizes,
+    "ingest": bench_ingest,
+    "receive": bench_receive,
+    "persistence": bench_persistence,
+    "health": bench_health,
+    "sessions": bench_sessions,
+    "approvals": bench_approvals,
+}
+
+
+def _prepare(market, workdir):
+    state = {
+        "inventory_csv": os.path.join(workdir, "inventory.csv"),
+        "sales_csv": os.path.join(workdir, "sales.csv"),
+        "db_file": os.path.join(workdir, "benchmark.db"),
+    }
+    market.drop(columns="Sales Last Week").to_csv(state["inventory_csv"], index=False)
+    sales_lines(market).to_csv(state["sales_csv"], index=False)
+    state["transfers"] = compute_suggestions(market)
+
+    init_store(state["db_file"])
+    with connect(state["db_file"]) as conn:
+        conn.executemany(
+            "INSERT INTO transfers (sku, quantity, from_location, to_location, status) VALUES (?, ?, ?, ?, 'Pending')",
+            state["transfers"][["SKU", "Qty", "From", "To"]].astype({"Qty": "int64"}).itertuples(index=False, name=None),
+        )
+        state["transfer_ids"] = [row[0] for row in conn.execute("SELECT id FROM transfers")]
+    save_inventory(market, db_file=state["db_file"])
+    state["stores"] = market["Store"].unique().tolist()
+    return state
+
+
+def run_benchmarks(stores=200, styles=300, sizes=8, seed=0, names=None, repeat=3):
+    # Best-of-N wall time per hot path, then one traced run for peak memory.
+    # tracemalloc sees Python, NumPy and pandas allocations, not Arrow's own pool.
+    market = synthetic_market(stores, styles, sizes, seed)
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        state = _prepare(market, workdir)
+        os.chdir(workdir)     # snapshots land in the scratch directory
+        try:
+            for name in names or BENCHMARKS:
+                bench = BENCHMARKS[name]
+                seconds = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    rows = bench(market, state)
+                    seconds.append(time.perf_counter() - start)
+                tracemalloc.start()
+                bench(market, state)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                results[name] = {
+                    "rows": rows,
+                    "seconds": min(seconds),
+                    "rows_per_sec": rows / min(seconds),
+                    "peak_mb": peak / 2**20,
+                }
+        finally:
+            os.chdir(cwd)
+    return {"params": {"stores": stores, "styles": styles, "sizes": sizes, "seed": seed, "rows": len(market)},
+            "results": results}
+
+
+# ------------------ BASELINE ------------------------
+def compare(report, baseline, tolerance=TOLERANCE):
+    # Names of hot paths whose throughput or peak memory regressed past the tolerance
+    if baseline.get("params") != report["params"]:
+        return None
+    regressions = []
+    for name, result in report["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        if result["rows_per_sec"] < before["rows_per_sec"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['rows_per_sec']:,.0f} rows/s vs {before['rows_per_sec']:,.0f}")
+        if result["peak_mb"] > before["peak_mb"] * (1 + tolerance):
+            regressions.append(f"{name}: {result['peak_mb']:.1f} MB peak vs {before['peak_mb']:.1f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the S2S hot paths on a synthetic market.")
+    parser.add_argument("--stores", type=int, default=200)
+    parser.add_argument("--styles", type=int, default=300)
+    parser.add_argument("--sizes", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per hot path (best is kept)")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="run only these hot paths")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline (local, not committed)")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.stores, args.styles, args.sizes, args.seed, args.only, args.repeat)
+    print(f"{report['params']['rows']:,} rows ({args.stores} stores x {args.styles} styles x {args.sizes} sizes)")
+    for name, result in report["results"].items():
+        print(f"    {name:<14} {result['seconds']:8.3f}s  {result['rows_per_sec']:>14,.0f} rows/s  "
+              f"{result['peak_mb']:8.1f} MB peak")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; record one with --save-baseline.")
+        return
+    with open(args.baseline) as f:
+        regressions = compare(report, json.load(f), args.tolerance)
+    if regressions is None:
+        print("Baseline was recorded with different parameters; not compared.")
+    elif regressions:
+        print("Regressions against baseline:")
+        for line in regressions:
+            print(f"    {line}")
+        sys.exit(1)
+    else:
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
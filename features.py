@@ -0,0 +1,217 @@
+import argparse
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from ingest import aggregate_sales
+
+FEATURE_FILE = "features/sales_features.npz"
+WINDOW_WEEKS = 8          # weeks of sales kept per (store, SKU)
+VELOCITY_WEEKS = 4        # weeks averaged for the default velocity
+GROWTH = 1.25             # headroom when new stores / SKUs arrive, so grids are rarely copied
+MAX_WEEKLY_UNITS = np.iinfo(np.uint16).max
+
+FEATURE_COLUMNS = ["Velocity", "Weeks of Cover", "Sell Through", "Days Live"]
+
+
+# ------------------ FEATURE STORE -------------------
+class FeatureStore:
+    # Rolling per-(store, SKU) sales statistics on dense store x SKU grids.
+    # A key is two small dimension lookups and one array index, so reads are
+    # O(1) and memory is fixed per key:
+    #   sales  uint16 [WINDOW_WEEKS, stores, skus]  ring buffer of weekly units
+    #   stock  int32  [stores, skus]                latest stock on hand
+    #   sold   int32  [stores, skus]                units sold since first seen
+    #   first  int16  [stores, skus]                week first seen, -1 = never
+    # i.e. 2 x WINDOW_WEEKS + 10 bytes per key (26 bytes, ~310 MB for 12M keys).
+
+    def __init__(self, window=WINDOW_WEEKS):
+        self.window = window
+        self.week = -1            # index of the latest loaded week
+        self.stores = pd.Index([], dtype=str)
+        self.skus = pd.Index([], dtype=str)
+        self._allocate(0, 0)
+
+    def _allocate(self, n_stores, n_skus):
+        self.sales = np.zeros((self.window, n_stores, n_skus), dtype=np.uint16)
+        self.stock = np.zeros((n_stores, n_skus), dtype=np.int32)
+        self.sold = np.zeros((n_stores, n_skus), dtype=np.int32)
+        self.first = np.full((n_stores, n_skus), -1, dtype=np.int16)
+
+    def nbytes(self):
+        return self.sales.nbytes + self.stock.nbytes + self.sold.nbytes + self.first.nbytes
+
+    # -------- keys --------
+    def _codes(self, stores, skus, add=False):
+        stores = pd.Index(stores).astype(str)
+        skus = pd.Index(skus).astype(str)
+        if add:
+            self._grow(stores.difference(self.stores), skus.difference(self.skus))
+        return self.stores.get_indexer(stores), self.skus.get_indexer(skus)
+
+    def _grow(self, new_stores, new_skus):
+        if len(new_stores) == 0 and len(new_skus) == 0:
+            return
+        self.stores = self.stores.append(new_stores)
+        self.skus = self.skus.append(new_skus)
+        n_stores, n_skus = self.stock.shape
+        if len(self.stores) <= n_stores and len(self.skus) <= n_skus:
+            return
+        old = (self.sales, self.stock, self.sold, self.first)
+        # The first load is sized exactly; later growth leaves headroom on the dimension that overflowed
+        grow = GROWTH if n_stores or n_skus else 1
+        self._allocate(n_stores if len(self.stores) <= n_stores else int(len(self.stores) * grow),
+                       n_skus if len(self.skus) <= n_skus else int(len(self.skus) * grow))
+        self.sales[:, :n_stores, :n_skus] = old[0]
+        self.stock[:n_stores, :n_skus] = old[1]
+        self.sold[:n_stores, :n_skus] = old[2]
+        self.first[:n_stores, :n_skus] = old[3]
+
+    # -------- weekly update --------
+    def update(self, weekly_sales, stock=None):
+        # Adds one week: weekly_sales has Store, SKU, Sales Last Week (one row per key
+        # or raw lines, summed here). stock, when given, replaces stock on hand for
+        # its keys. Only the new week is touched; history is never re-read.
+        self.week += 1
+        slot = self.week % self.window
+        self.sales[slot] = 0
+
+        for frame, column in ((weekly_sales, "Sales Last Week"), (stock, "Stock Qty")):
+            if frame is None or frame.empty:
+                continue
+            s, k = self._codes(frame["Store"], frame["SKU"], add=True)
+            keys = s.astype("int64") * self.stock.shape[1] + k
+            values = frame[column].fillna(0).to_numpy(dtype="int64")
+            if column == "Sales Last Week":
+                # Sum duplicate lines per key, then write only the touched cells
+                keys, inverse = np.unique(keys, return_inverse=True)
+                values = np.bincount(inverse, weights=values).astype("int64")
+                self.sales[slot].reshape(-1)[keys] = np.minimum(values, MAX_WEEKLY_UNITS)
+                self.sold.reshape(-1)[keys] += values.astype(np.int32)
+            else:
+                self.stock.reshape(-1)[keys] = values
+            seen = keys[values > 0]
+            first = self.first.reshape(-1)
+            first[seen[first[seen] < 0]] = self.week
+
+    # -------- reads --------
+    def _last_weeks(self, weeks):
+        weeks = min(weeks, self.window, self.week + 1)
+        return [(self.week - i) % self.window for i in range(weeks)], max(weeks, 1)
+
+    def features(self, stores, skus, weeks=VELOCITY_WEEKS):
+        # Vectorised lookup of FEATURE_COLUMNS for aligned store / SKU arrays;
+        # unknown keys come back as zeros
+        s, k = self._codes(stores, skus)
+        known = (s >= 0) & (k >= 0)
+        s, k = s[known], k[known]
+        slots, n = self._last_weeks(weeks)
+
+        velocity = np.zeros(len(known))
+        stock = np.zeros(len(known))
+        sold = np.zeros(len(known))
+        days = np.zeros(len(known), dtype="int64")
+        first = self.first[s, k]
+        live_weeks = np.where(first >= 0, self.week - first + 1, 0)
+        # Keys newer than the window are averaged over the weeks they were live
+        velocity[known] = self.sales[np.array(slots)[:, None], s, k].sum(axis=0) / np.clip(live_weeks, 1, n)
+        stock[known] = self.stock[s, k]
+        sold[known] = self.sold[s, k]
+        days[known] = live_weeks * 7
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cover = np.where(velocity > 0, stock / velocity, np.where(stock > 0, np.inf, 0.0))
+            sell_through = np.where(sold + stock > 0, sold / (sold + stock), 0.0)
+        return pd.DataFrame({"Velocity": velocity, "Weeks of Cover": cover,
+                             "Sell Through": sell_through, "Days Live": days})
+
+    def lookup(self, store, sku, weeks=VELOCITY_WEEKS):
+        # Single key without building a frame: two hash lookups and a few array reads
+        try:
+            s, k = self.stores.get_loc(str(store)), self.skus.get_loc(str(sku))
+        except KeyError:
+            return dict.fromkeys(FEATURE_COLUMNS, 0.0)
+        slots, n = self._last_weeks(weeks)
+        first = int(self.first[s, k])
+        live_weeks = self.week - first + 1 if first >= 0 else 0
+        velocity = int(self.sales[slots, s, k].sum()) / min(max(live_weeks, 1), n)
+        stock, sold = int(self.stock[s, k]), int(self.sold[s, k])
+        cover = stock / velocity if velocity > 0 else (float("inf") if stock > 0 else 0.0)
+        return {"Velocity": velocity, "Weeks of Cover": cover,
+                "Sell Through": sold / (sold + stock) if sold + stock > 0 else 0.0,
+                "Days Live": live_weeks * 7}
+
+    def enrich(self, inventory, weeks=VELOCITY_WEEKS):
+        # Inventory with FEATURE_COLUMNS added in one vectorised pass; columns the
+        # upload already carries (e.g. Days Live) are kept as they are
+        missing = [c for c in FEATURE_COLUMNS if c not in inventory.columns]
+        if not missing:
+            return inventory
+        features = self.features(inventory["Store"], inventory["SKU"], weeks)
+        return inventory.assign(**{c: features[c].to_numpy() for c in missing})
+
+    # -------- persistence --------
+    def save(self, path=FEATURE_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp.npz"
+        n_stores, n_skus = len(self.stores), len(self.skus)
+        np.savez(tmp, week=self.week, window=self.window,
+                 stores=self.stores.to_numpy(dtype=str), skus=self.skus.to_numpy(dtype=str),
+                 sales=self.sales[:, :n_stores, :n_skus], stock=self.stock[:n_stores, :n_skus],
+                 sold=self.sold[:n_stores, :n_skus], first=self.first[:n_stores, :n_skus])
+        os.replace(tmp, path)      # readers never see a half-written file
+        return path
+
+
+def read_features(path=FEATURE_FILE):
+    with np.load(path) as data:
+        store = FeatureStore(int(data["window"]))
+        store.week = int(data["week"])
+        store.stores = pd.Index(data["stores"]).astype(str)
+        store.skus = pd.Index(data["skus"]).astype(str)
+        store.sales, store.stock, store.sold, store.first = data["sales"], data["stock"], data["sold"], data["first"]
+    return store
+
+
+@lru_cache(maxsize=2)
+def _load(path, mtime):
+    return read_features(path)
+
+
+def load_features(path=FEATURE_FILE):
+    # Shared read-only copy per file version; None when no feature file has been built yet
+    if not os.path.exists(path):
+        return None
+    return _load(path, os.path.getmtime(path))
+
+
+def demand_rate(df):
+    # Weekly units used to rank and size transfers: multi-week velocity when the
+    # feature store has been joined on, else the single Sales Last Week figure
+    column = "Velocity" if "Velocity" in df.columns else "Sales Last Week"
+    return df[column].fillna(0).to_numpy(dtype="float64")
+
+
+# ------------------ WEEKLY ENTRY POINT --------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add one week of sales to the rolling feature store.")
+    parser.add_argument("sales", help="weekly sales CSV (Store, SKU, Sales Last Week)")
+    parser.add_argument("--stock", default=None, help="inventory CSV with Stock Qty at the end of the week")
+    parser.add_argument("--features", default=FEATURE_FILE, help="feature store file")
+    args = parser.parse_args(argv)
+
+    store = read_features(args.features) if os.path.exists(args.features) else FeatureStore()
+    with open(args.sales, "rb") as f:
+        sales = aggregate_sales(f).rename("Sales Last Week").reset_index()
+    stock = None
+    if args.stock:
+        stock = pd.read_csv(args.stock, usecols=["Store", "SKU", "Stock Qty"], dtype={"Store": str, "SKU": str})
+    store.update(sales, stock)
+    store.save(args.features)
+    print(f"Week {store.week}: {len(store.stores)} stores x {len(store.skus)} SKUs, {store.nbytes() / 2**20:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
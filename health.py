@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from profiling import POOL_CONTEXT
+
+HEALTHY_SIZE_SHARE = 0.6     # share of a store-style's sizes (rows) that must be in stock
+MIN_WEEKS_COVER = 1          # and total stock must cover this many weeks of sales
+PARALLEL_ROWS = 2_000_000    # baseline is split per brand across processes above this
+GROUPS = ["Brand", "Sport"]
+
+COUNT = "Store Style Count"
+HEALTHY = "Healthy Combinations"
+
+
+# ------------------ COMBINATION STATS ---------------
+def _rows(inventory):
+    # Normalised row table: one row per (Store, SKU) with its style and grouping
+    rows = pd.DataFrame({
+        "Store": inventory["Store"].astype(str).to_numpy(),
+        "SKU": inventory["SKU"].astype(str).to_numpy(),
+        "Stock Qty": inventory["Stock Qty"].fillna(0).to_numpy(dtype="int64"),
+        "Sales Last Week": (inventory["Sales Last Week"].fillna(0).to_numpy(dtype="float64")
+                            if "Sales Last Week" in inventory else 0.0),
+    })
+    rows["Style"] = inventory["Style"].astype(str).to_numpy() if "Style" in inventory else rows["SKU"]
+    for column in GROUPS:
+        rows[column] = inventory[column].astype(str).to_numpy() if column in inventory else "ALL"
+    return rows
+
+
+def combination_stats(rows):
+    # Store-style combinations: counted when stocked, healthy when enough sizes
+    # are in stock and the stock covers demand
+    combos = rows.assign(in_stock=rows["Stock Qty"] > 0).groupby(["Store", "Style"], sort=False).agg(
+        Brand=("Brand", "first"), Sport=("Sport", "first"),
+        sizes=("SKU", "size"), in_stock=("in_stock", "sum"),
+        stock=("Stock Qty", "sum"), sales=("Sales Last Week", "sum"),
+    )
+    combos["counted"] = combos["stock"] > 0
+    combos["healthy"] = (
+        combos["counted"]
+        & (combos["in_stock"] >= HEALTHY_SIZE_SHARE * combos["sizes"])
+        & (combos["stock"] >= MIN_WEEKS_COVER * combos["sales"])
+    )
+    return combos
+
+
+def group_counts(combos):
+    counts = combos.groupby(GROUPS, sort=False)[["counted", "healthy"]].sum()
+    return counts.rename(columns={"counted": COUNT, "healthy": HEALTHY}).astype("int64")
+
+
+def _brand_counts(rows):
+    return group_counts(combination_stats(rows))
+
+
+# ------------------ ROLLUPS -------------------------
+def rollup(counts):
+    # Brand/Sport rows with a "Total" row per brand and a closing "Grand Total"
+    counts = counts.sort_index()
+    subtotals = counts.groupby(level="Brand").sum()
+    subtotals.index = pd.MultiIndex.from_arrays([subtotals.index, ["Total"] * len(subtotals)], names=GROUPS)
+    grand = counts.sum().to_frame().T
+    grand.index = pd.MultiIndex.from_tuples([("", "Grand Total")], names=GROUPS)
+
+    # Subtotals sort after their brand's sports, the grand total last
+    table = pd.concat([counts, subtotals])
+    order = np.lexsort((table.index.get_level_values("Sport") == "Total", table.index.get_level_values("Brand")))
+    table = pd.concat([table.iloc[order], grand]).reset_index()
+
+    for phase in ["Pre S2S", "Post S2S"]:
+        count, healthy = f"{phase} - {COUNT}", f"{phase} {HEALTHY}"
+        if count in table:
+            table[f"{phase} - health%"] = (100 * table[healthy] / table[count].replace(0, np.nan)).fillna(0).round(0)
+    return table
+
+
+# ------------------ ENGINE --------------------------
+class HealthEngine:
+    # Pre-S2S baseline is computed once; each plan only recomputes the
+    # store-style combinations its transfer lines touch.
+
+    def __init__(self, inventory, max_workers=None):
+        self.rows = _rows(inventory)
+        self.sku_attributes = self.rows.drop_duplicates("SKU").set_index("SKU")[["Style"] + GROUPS]
+        brands = self.rows["Brand"].unique()
+        if len(self.rows) > PARALLEL_ROWS and len(brands) > 1:
+            parts = [self.rows[self.rows["Brand"] == brand] for brand in brands]
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=POOL_CONTEXT) as pool:
+                self.baseline = pd.concat(pool.map(_brand_counts, parts))
+        else:
+            self.baseline = _brand_counts(self.rows)
+        self._combo_keys = pd.MultiIndex.from_arrays([self.rows["Store"], self.rows["Style"]])
+
+    def _post_counts(self, plan):
+        deltas = pd.concat([
+            pd.DataFrame({"Store": plan["From"].astype(str).to_numpy(), "SKU": plan["SKU"].astype(str).to_numpy(),
+                          "delta": -plan["Qty"].to_numpy(dtype="int64")}),
+            pd.DataFrame({"Store": plan["To"].astype(str).to_numpy(), "SKU": plan["SKU"].astype(str).to_numpy(),
+                          "delta": plan["Qty"].to_numpy(dtype="int64")}),
+        ]).groupby(["Store", "SKU"], as_index=False)["delta"].sum()
+        deltas = deltas[deltas["SKU"].isin(self.sku_attributes.index)].join(self.sku_attributes, on="SKU")
+
+        touched = pd.MultiIndex.from_arrays([deltas["Store"], deltas["Style"]]).unique()
+        before = self.rows[self._combo_keys.isin(touched)]
+
+        after = before.merge(deltas[["Store", "SKU", "delta"]], on=["Store", "SKU"], how="outer")
+        new = after["Style"].isna()
+        if new.any():
+            attrs = self.sku_attributes.loc[after.loc[new, "SKU"]]
+            for column in ["Style"] + GROUPS:
+                after.loc[new, column] = attrs[column].to_numpy()
+            after.loc[new, ["Stock Qty", "Sales Last Week"]] = 0
+        after["Stock Qty"] = after["Stock Qty"] + after["delta"].fillna(0)
+
+        change = group_counts(combination_stats(after)).sub(group_counts(combination_stats(before)), fill_value=0)
+        return self.baseline.add(change, fill_value=0).astype("int64")
+
+    def report(self, plan=None):
+        pre = self.baseline.add_prefix("Pre S2S - ").rename(columns={f"Pre S2S - {HEALTHY}": f"Pre S2S {HEALTHY}"})
+        if plan is None or plan.empty:
+            post = self.baseline
+        else:
+            post = self._post_counts(plan)
+        post = post.add_prefix("Post S2S - ").rename(columns={f"Post S2S - {HEALTHY}": f"Post S2S {HEALTHY}"})
+        counts = pre.join(post, how="outer").fillna(0).astype("int64")
+        columns = [f"Pre S2S - {COUNT}", f"Post S2S - {COUNT}", f"Pre S2S {HEALTHY}", f"Post S2S {HEALTHY}"]
+        return rollup(counts[columns])
+
+    def compare(self, plans):
+        # Side-by-side reports for alternative plans against the same baseline
+        return {name: self.report(plan) for name, plan in plans.items()}
@@ -0,0 +1,128 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from profiling import instrumented, timed
+
+CHUNK_ROWS = 250_000
+COLLAPSE_EVERY = 8            # chunks between folding partial sales aggregates together
+
+KEYS = ["Store", "SKU"]
+CATEGORY_COLUMNS = ["Store", "SKU", "Product"]
+QUANTITY_COLUMNS = ["Stock Qty", "Sales Last Week"]
+UPLOAD_IDS_KEPT = 256         # uploads whose content hash is remembered across reruns
+
+
+# ------------------ HELPERS -------------------------
+def compact_quantity(values):
+    # int32 when every value is whole, else float32, so fractional sales are never truncated
+    values = pd.to_numeric(pd.Series(values), errors="coerce").fillna(0)
+    return values.astype("int32" if (values % 1 == 0).all() else "float32")
+
+
+_upload_ids = OrderedDict()   # uploaded file_id -> content hash
+_upload_ids_lock = threading.Lock()
+
+
+def upload_id(uploaded):
+    # Identity of an uploaded file by content, so a new export under the same name and
+    # size is never mistaken for the last one. Hashed once per upload, not per rerun.
+    file_id = getattr(uploaded, "file_id", None)
+    with _upload_ids_lock:
+        if file_id is not None and file_id in _upload_ids:
+            return _upload_ids[file_id]
+    digest = hashlib.blake2b(uploaded.getvalue(), digest_size=16).hexdigest()
+    if file_id is not None:
+        with _upload_ids_lock:
+            _upload_ids[file_id] = digest
+            while len(_upload_ids) > UPLOAD_IDS_KEPT:
+                _upload_ids.popitem(last=False)
+    return digest
+
+
+def _read_chunks(source, on_progress=None, label="", **kwargs):
+    # Yields compact chunks and reports progress as the fraction of bytes read
+    size = getattr(source, "size", None)
+    reader = pd.read_csv(source, chunksize=CHUNK_ROWS, dtype={"Store": str, "SKU": str}, **kwargs)
+    for chunk in reader:
+        for column in QUANTITY_COLUMNS:
+            if column in chunk.columns:
+                chunk[column] = compact_quantity(chunk[column]).to_numpy()
+        if on_progress and size and hasattr(source, "tell"):
+            on_progress(min(source.tell() / size, 1.0), label)
+        yield chunk
+
+
+def _concat_categorical(chunks, columns):
+    # Concatenate chunks whose categorical columns carry different categories
+    combined = {}
+    for column in columns:
+        combined[column] = union_categoricals([chunk[column] for chunk in chunks])
+    df = pd.concat([chunk.drop(columns=columns) for chunk in chunks], ignore_index=True)
+    for column in columns:
+        df[column] = pd.Categorical(combined[column])
+    return df[list(chunks[0].columns)]
+
+
+# ------------------ SALES ---------------------------
+@instrumented("ingest: aggregate sales", rows=len)
+def aggregate_sales(source, on_progress=None):
+    # Weekly sales summed per (Store, SKU); memory follows distinct pairs, not file size
+    totals = None
+    partials = []
+    chunks = _read_chunks(source, on_progress, "Aggregating sales...",
+                          usecols=KEYS + ["Sales Last Week"])
+    for i, chunk in enumerate(chunks, start=1):
+        partials.append(chunk.groupby(KEYS, sort=False)["Sales Last Week"].sum())
+        if i % COLLAPSE_EVERY == 0:
+            totals = _collapse(totals, partials)
+            partials = []
+    return _collapse(totals, partials)
+
+
+def _collapse(totals, partials):
+    parts = ([totals] if totals is not None else []) + partials
+    if not parts:
+        return pd.Series(dtype="int32", index=pd.MultiIndex.from_arrays([[], []], names=KEYS))
+    totals = pd.concat(parts).groupby(level=KEYS, sort=False).sum()
+    return pd.Series(compact_quantity(totals).to_numpy(), index=totals.index, name=totals.name)
+
+
+# ------------------ INVENTORY -----------------------
+@instrumented("ingest: read inventory", rows=len)
+def load_inventory(source, on_progress=None):
+    chunks = []
+    for chunk in _read_chunks(source, on_progress, "Reading inventory..."):
+        if "Sales Last Week" in chunk.columns:
+            chunk = chunk.drop(columns="Sales Last Week")
+        for column in CATEGORY_COLUMNS:
+            if column in chunk.columns:
+                chunk[column] = chunk[column].astype("category")
+        chunks.append(chunk)
+    if not chunks:
+        return pd.DataFrame(columns=["Store", "SKU", "Product", "Stock Qty"])
+    return _concat_categorical(chunks, [c for c in CATEGORY_COLUMNS if c in chunks[0].columns])
+
+
+def ingest(inventory_source, sales_source, on_progress=None):
+    # Streaming replacement for read_csv + merge: inventory keyed by (Store, SKU)
+    # picks up the aggregated sales with one indexed lookup.
+    def stage(start, span):
+        if on_progress is None:
+            return None
+        return lambda fraction, label: on_progress(start + span * fraction, label)
+
+    inventory = load_inventory(inventory_source, stage(0.0, 0.4))
+    sales = aggregate_sales(sales_source, stage(0.4, 0.5))
+    if on_progress:
+        on_progress(0.9, "Joining sales to inventory...")
+
+    with timed("ingest: merge sales", rows=len(inventory)):
+        keys = pd.MultiIndex.from_arrays([inventory["Store"].astype(str), inventory["SKU"].astype(str)])
+        inventory["Sales Last Week"] = compact_quantity(sales.reindex(keys)).to_numpy()
+    if on_progress:
+        on_progress(1.0, "Done")
+    return inventory
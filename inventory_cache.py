@@ -0,0 +1,171 @@
+import threading
+from collections import OrderedDict
+
+from snapshots import load_snapshot, save_snapshot, snapshot_version
+
+DEFAULT_MARKET = "All"
+INVENTORY_CACHE_BYTES = 2 * 1024 ** 3   # budget for all cached markets together
+
+
+# ------------------ SHARED INVENTORY CACHE ----------
+class InventoryCache:
+    # Process-wide inventory frames keyed by (market, version). Streamlit reruns
+    # re-execute the app script but not imported modules, so every session in
+    # the server process shares the one SHARED_CACHE below.
+
+    def __init__(self, max_bytes=INVENTORY_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # (market, version) -> (df, source, size)
+        self._latest = {}               # market -> version
+        self._next_version = 1
+        self._lock = threading.Lock()
+
+    def publish(self, market, df, source=None):
+        # A new upload (or receive) replaces whatever the market had before
+        size = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            self._drop(market)
+            version = self._next_version
+            self._next_version += 1
+            self._entries[(market, version)] = (df, source, size)
+            self._latest[market] = version
+            self._evict(keep=(market, version))
+            return version
+
+    def get(self, market=DEFAULT_MARKET):
+        # Shallow copy: sessions share the column data and never write to it in place
+        with self._lock:
+            version = self._latest.get(market)
+            if version is None:
+                return None
+            self._entries.move_to_end((market, version))
+            df = self._entries[(market, version)][0]
+        return df.copy(deep=False)
+
+    def version(self, market=DEFAULT_MARKET):
+        with self._lock:
+            return self._latest.get(market)
+
+    def source(self, market=DEFAULT_MARKET):
+        with self._lock:
+            version = self._latest.get(market)
+            return None if version is None else self._entries[(market, version)][1]
+
+    def invalidate(self, market=DEFAULT_MARKET):
+        with self._lock:
+            self._drop(market)
+
+    def nbytes(self):
+        with self._lock:
+            return sum(size for _, _, size in self._entries.values())
+
+    def _drop(self, market):
+        version = self._latest.pop(market, None)
+        if version is not None:
+            del self._entries[(market, version)]
+
+    def _evict(self, keep):
+        # Least recently used markets go first; the entry just published always stays
+        total = sum(size for _, _, size in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._entries.pop(key)[2]
+            del self._latest[key[0]]
+
+
+SHARED_CACHE = InventoryCache()
+
+
+# ------------------ DERIVED CACHES ------------------
+class VersionedCache:
+    # One object derived from a market's inventory (metrics, indexes, models),
+    # shared across sessions and rebuilt only when the version moves. Builds run
+    # outside the shared lock under a per-market one: a slow build never blocks
+    # other markets or readers of a current entry, and sessions asking for the
+    # same new version wait for one build instead of repeating it.
+
+    def __init__(self, build):
+        self.build = build
+        self._entries = {}     # market -> (version, value)
+        self._building = {}    # market -> Lock held while that market builds
+        self._lock = threading.Lock()
+
+    def _current(self, market, version):
+        cached = self._entries.get(market)
+        return cached is not None and cached[0] == version, cached
+
+    def get(self, market, version, *args):
+        # The value for (market, version), built with build(*args) on a miss
+        with self._lock:
+            hit, cached = self._current(market, version)
+            if hit:
+                return cached[1]
+            building = self._building.setdefault(market, threading.Lock())
+        with building:
+            with self._lock:
+                hit, cached = self._current(market, version)
+            if hit:
+                return cached[1]
+            value = self.build(*args)
+            with self._lock:
+                self._entries[market] = (version, value)
+            return value
+
+    def peek(self, market):
+        # (version, value) currently held for the market, or None
+        with self._lock:
+            return self._entries.get(market)
+
+    def put(self, market, version, value):
+        with self._lock:
+            self._entries[market] = (version, value)
+
+
+# ------------------ SNAPSHOT FALLBACK ---------------
+_loaded_snapshots = {}   # market -> snapshot version the cached frame came from
+
+
+def cached_inventory(snapshot, market=DEFAULT_MARKET, columns=None):
+    # Shared copy when warm; otherwise the on-disk snapshot. A snapshot rewritten
+    # by another process (e.g. a batch receive) replaces the cached copy. A
+    # projected cold read returns just those columns without filling the cache.
+    version = snapshot_version(snapshot)
+    df = SHARED_CACHE.get(market)
+    if df is not None and version is not None and _loaded_snapshots.get(market) != version:
+        df = None
+    if df is None and version is not None:
+        if columns is not None:
+            return load_snapshot(snapshot, columns)
+        df = load_snapshot(snapshot)
+        SHARED_CACHE.publish(market, df, source=("snapshot", version))
+        _loaded_snapshots[market] = version
+    if df is None:
+        return None
+    return df if columns is None else df[[c for c in columns if c in df.columns]]
+
+
+def inventory_loaded(snapshot, market=DEFAULT_MARKET):
+    # True when the shared copy is current, i.e. cached_inventory needs no disk read
+    return SHARED_CACHE.version(market) is not None and _loaded_snapshots.get(market) == snapshot_version(snapshot)
+
+
+_market_locks = {}       # market -> RLock held for a whole read-modify-publish cycle
+_market_locks_lock = threading.Lock()
+
+
+def market_lock(market=DEFAULT_MARKET):
+    # Receives read the market, apply their changes and publish the result; holding
+    # this across all three keeps two of them from publishing over each other
+    with _market_locks_lock:
+        return _market_locks.setdefault(market, threading.RLock())
+
+
+def publish_inventory(df, snapshot, market=DEFAULT_MARKET, source=None):
+    # Persist once as a snapshot, then share the frame with every session
+    with market_lock(market):
+        save_snapshot(df, snapshot)
+        _loaded_snapshots[market] = snapshot_version(snapshot)
+        return SHARED_CACHE.publish(market, df, source=source)
@@ -0,0 +1,30 @@
+import time
+
+import streamlit as st
+
+from jobs import get_job
+
+POLL_SECONDS = 1.0
+
+
+# ------------------ JOB STATUS ----------------------
+def job_progress(job_id):
+    # Shows a running job's progress and polls by rerunning; returns the job
+    # once it has finished (Done or Failed), None while it is still going
+    job = get_job(job_id)
+    if job is None:
+        st.error("Job not found.")
+        return None
+    if job["status"] == "Failed":
+        st.error(f"Job {job_id} failed.")
+        with st.expander("Details"):
+            st.code(job["error"] or "", language="text")
+        return job
+    if job["status"] == "Done":
+        return job
+
+    st.progress(min(job["progress"], 1.0), text=job["message"] or job["status"])
+    st.caption(f"Job {job_id} is {job['status'].lower()} in the background. "
+               "You can leave this page and come back; the result is kept.")
+    time.sleep(POLL_SECONDS)
+    st.rerun()
@@ -0,0 +1,162 @@
+import os
+import socket
+import sqlite3
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from ingest import ingest
+from inventory_cache import publish_inventory
+from pipeline import run_pipeline
+from snapshots import has_snapshot, load_snapshot, save_snapshot, snapshot_version
+from transfer_store import DB_FILE, connect, save_inventory
+
+JOB_WORKERS = 2          # long jobs run side by side; each may fan out to its own process pool
+ACTIVE = ("Queued", "Running")
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="s2s-job")
+_worker = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+# ------------------ JOB TABLE -----------------------
+def init_jobs(db_file=DB_FILE):
+    with connect(db_file) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'Queued',
+                progress REAL NOT NULL DEFAULT 0,
+                message TEXT,
+                result TEXT,
+                error TEXT,
+                worker TEXT,
+                submitted_by TEXT,
+                submitted_at TEXT,
+                finished_at TEXT
+            )
+        """)
+        # At most one active job per (kind, key): the second submit finds the first
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active ON jobs (kind, key) "
+                     "WHERE status IN ('Queued', 'Running')")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_kind_key ON jobs (kind, key, id)")
+    _fail_orphans(db_file)
+
+
+def _fail_orphans(db_file=DB_FILE):
+    # Active jobs whose worker process on this host is gone will never finish
+    host = socket.gethostname()
+    with connect(db_file) as conn:
+        for row in conn.execute("SELECT id, worker FROM jobs WHERE status IN ('Queued', 'Running')").fetchall():
+            worker_host, _, pid = (row["worker"] or "").rpartition(":")
+            if worker_host == host and pid.isdigit() and not _alive(int(pid)):
+                conn.execute("UPDATE jobs SET status = 'Failed', error = 'Interrupted', finished_at = ? WHERE id = ?",
+                             (_now(), row["id"]))
+
+
+def _alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _update(job_id, db_file, **fields):
+    assignments = ", ".join(f"{column} = ?" for column in fields)
+    with connect(db_file) as conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+def get_job(job_id, db_file=DB_FILE):
+    with connect(db_file) as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (int(job_id),)).fetchone()
+    return dict(row) if row else None
+
+
+def latest_job(kind, key, db_file=DB_FILE):
+    with connect(db_file) as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE kind = ? AND key = ? ORDER BY id DESC LIMIT 1",
+                           (kind, str(key))).fetchone()
+    return dict(row) if row else None
+
+
+def job_result(job_id, db_file=DB_FILE):
+    # DataFrame stored by a finished job, or None
+    job = get_job(job_id, db_file)
+    if job is None or job["status"] != "Done" or not job["result"] or not has_snapshot(job["result"]):
+        return None
+    return load_snapshot(job["result"])
+
+
+# ------------------ RUNNER --------------------------
+def _run(job_id, func, args, kwargs, db_file):
+    def on_progress(fraction, label=None):
+        _update(job_id, db_file, progress=float(fraction), message=label)
+
+    _update(job_id, db_file, status="Running")
+    try:
+        result = func(*args, on_progress=on_progress, **kwargs)
+        # DataFrames are kept as a snapshot; a string names a snapshot the job wrote itself
+        if isinstance(result, pd.DataFrame):
+            save_snapshot(result, f"job_{job_id}")
+            result = f"job_{job_id}"
+        _update(job_id, db_file, status="Done", progress=1.0, result=result, finished_at=_now())
+    except Exception:
+        _update(job_id, db_file, status="Failed", error=traceback.format_exc(limit=5), finished_at=_now())
+
+
+def submit_job(kind, key, func, *args, db_file=DB_FILE, submitted_by=None, reuse=True, **kwargs):
+    # Starts func(*args, on_progress=..., **kwargs) in the background and returns the job id.
+    # An active job with the same (kind, key) is joined instead of started again, and
+    # with reuse=True a finished one is returned: a result is picked up from cache and
+    # a failure stays visible until it is retried with reuse=False.
+    key = str(key)
+    existing = latest_job(kind, key, db_file)
+    if existing and existing["status"] in ACTIVE:
+        return existing["id"]
+    if existing and reuse and (existing["status"] == "Failed" or not existing["result"]
+                               or has_snapshot(existing["result"])):
+        return existing["id"]
+    try:
+        with connect(db_file) as conn:
+            job_id = conn.execute(
+                "INSERT INTO jobs (kind, key, worker, submitted_by, submitted_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, key, _worker, submitted_by, _now()),
+            ).lastrowid
+    except sqlite3.IntegrityError:
+        # Lost the race to another session; join its job
+        return latest_job(kind, key, db_file)["id"]
+    _executor.submit(_run, job_id, func, args, kwargs, db_file)
+    return job_id
+
+
+# ------------------ JOB FUNCTIONS -------------------
+def pipeline_job(inventory, on_progress=None, **options):
+    # sts.py step 2: the full stage pipeline, keeping the recommendations
+    def stage_progress(done, total, label):
+        if on_progress:
+            on_progress(done / total, label)
+    return run_pipeline(inventory, on_progress=stage_progress, **options)["recommendations"]
+
+
+def ingest_job(inventory_source, sales_source, snapshot, source=None, on_progress=None):
+    # Upload merge: publishes the merged inventory itself, so the result is its snapshot.
+    # The per-store inventory table is refreshed too, for store-level reads.
+    merged = ingest(inventory_source, sales_source, on_progress)
+    publish_inventory(merged, snapshot, source=source)
+    if on_progress:
+        on_progress(1.0, "Saving store inventories...")
+    save_inventory(merged, source=snapshot_version(snapshot))
+    return snapshot
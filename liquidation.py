@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+from features import demand_rate
+from inventory_cache import VersionedCache
+
+HORIZON_WEEKS = 8              # full-price selling window left for the season
+MARKDOWN_SELL_THROUGH = 0.5    # sell-through a markdown is expected to reach over the same window
+SLICE_COLUMNS = ["Brand", "Sport", "Season"]
+
+KEEP = "Keep"
+PULL_BACK = "Pull Back"
+LIQUIDATE = "Liquidate"
+
+
+# ------------------ SCORING -------------------------
+def score_liquidation(inventory, plan=None, horizon_weeks=HORIZON_WEEKS, benchmark=MARKDOWN_SELL_THROUGH):
+    # One row per (Store, Style). Stock left after the plan's transfers is set
+    # against the units the store-style should sell at full price over the
+    # horizon. Below the markdown benchmark the excess is pulled back when the
+    # style still sells through across the market, and liquidated when it does
+    # not. Every step is a bincount over integer group codes.
+    styles = inventory["Style"] if "Style" in inventory.columns else inventory["SKU"]
+    store_codes, stores = pd.factorize(inventory["Store"].astype(str))
+    style_codes, style_names = pd.factorize(styles.astype(str))
+    keys = store_codes.astype("int64") * len(style_names) + style_codes
+    groups, first, group = np.unique(keys, return_index=True, return_inverse=True)
+    n = len(groups)
+
+    stock = np.bincount(group, weights=inventory["Stock Qty"].fillna(0).to_numpy(dtype="float64"), minlength=n)
+    rate = np.bincount(group, weights=demand_rate(inventory), minlength=n)
+    moved_in = np.zeros(n)
+    moved_out = np.zeros(n)
+    if plan is not None and not plan.empty and n:
+        # A transfer counts against the store-style of its SKU; receivers without
+        # the style yet start from nothing and cannot be pull-back candidates
+        sku_style = pd.Series(style_codes, index=inventory["SKU"].astype(str).to_numpy())
+        sku_style = sku_style[~sku_style.index.duplicated()]
+        plan_style = sku_style.reindex(plan["SKU"].astype(str).to_numpy()).to_numpy()
+        qty = plan["Qty"].to_numpy(dtype="float64")
+        for column, moved in (("From", moved_out), ("To", moved_in)):
+            plan_store = stores.get_indexer(plan[column].astype(str))
+            plan_keys = plan_store.astype("int64") * len(style_names) + np.nan_to_num(plan_style, nan=-1).astype("int64")
+            at = np.searchsorted(groups, plan_keys).clip(max=n - 1)
+            hit = (plan_store >= 0) & ~np.isnan(plan_style) & (groups[at] == plan_keys)
+            moved += np.bincount(at[hit], weights=qty[hit], minlength=n)
+
+    post = stock + moved_in - moved_out
+    expected = rate * horizon_weeks
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sell_through = np.where(post > 0, np.minimum(expected / post, 1.0), 1.0)
+        style_post = np.bincount(groups % len(style_names), weights=post, minlength=len(style_names))
+        style_expected = np.bincount(groups % len(style_names), weights=expected, minlength=len(style_names))
+        market = np.where(style_post > 0, np.minimum(style_expected / style_post, 1.0), 1.0)[groups % len(style_names)]
+
+    action = np.full(n, KEEP, dtype=object)
+    below = sell_through < benchmark
+    action[below] = np.where(market[below] >= benchmark, PULL_BACK, LIQUIDATE)
+    excess = np.where(below, np.maximum(post - np.ceil(expected), 0), 0).astype("int64")
+
+    table = pd.DataFrame({"Store": stores[groups // len(style_names)], "Style": style_names[groups % len(style_names)]})
+    for column in SLICE_COLUMNS:
+        if column in inventory.columns:
+            table[column] = inventory[column].astype(str).to_numpy()[first]
+    return table.assign(**{
+        "Stock Qty": stock.astype("int64"),
+        "Transfer In": moved_in.astype("int64"),
+        "Transfer Out": moved_out.astype("int64"),
+        "Post Stock": post.astype("int64"),
+        "Weekly Sales": rate,
+        "Expected Sell Through": sell_through,
+        "Market Sell Through": market,
+        "Score": sell_through / benchmark,
+        "Action": action,
+        "Excess Qty": excess,
+        "Pull Back": np.where(action == PULL_BACK, excess, 0),
+    })
+
+
+# ------------------ SLICING -------------------------
+class LiquidationScores:
+    # Scored once per input snapshot; the UI slices and totals the same table
+
+    def __init__(self, inventory, plan=None):
+        self.table = score_liquidation(inventory, plan)
+        self.slice_columns = [c for c in SLICE_COLUMNS if c in self.table.columns]
+
+    def options(self, column):
+        return sorted(self.table[column].unique())
+
+    def slice(self, **selected):
+        # Keyword per slice column with the values to keep; empty selections keep everything
+        mask = np.ones(len(self.table), dtype=bool)
+        for column, values in selected.items():
+            if values and column in self.slice_columns:
+                mask &= self.table[column].isin(values).to_numpy()
+        return self.table[mask]
+
+    @staticmethod
+    def summary(table, by=None):
+        # Store-styles and units per action, optionally per slice column
+        keys = ([by] if by else []) + ["Action"]
+        out = table.groupby(keys, sort=True).agg(**{"Store Styles": ("Store", "size"), "Excess Qty": ("Excess Qty", "sum"),
+                                                   "Pull Back": ("Pull Back", "sum")})
+        return out.reset_index()
+
+
+def plan_fingerprint(plan):
+    # Order-independent hash of the transfer lines, so a new plan on the same upload rescores
+    if plan is None or plan.empty:
+        return 0
+    return int(pd.util.hash_pandas_object(plan[["SKU", "From", "To", "Qty"]].astype(str), index=False).sum())
+
+
+def _score(load_inventory, plan):
+    return LiquidationScores(load_inventory(), plan)
+
+
+_scores = VersionedCache(_score)
+
+
+def scores_for(market, version, load_inventory, plan):
+    # Rescored when the input inventory or the plan changes; load_inventory() is only called then
+    return _scores.get(market, (version, plan_fingerprint(plan)), load_inventory, plan)
@@ -0,0 +1,33 @@
+from inventory_cache import VersionedCache
+
+TOP_PRODUCTS = 40     # bars drawn on the dashboard chart; the rest fold into "Other"
+OTHER = "Other"
+
+
+# ------------------ INVENTORY METRICS ---------------
+class InventoryMetrics:
+    # Stock per (Product, Status), the only shape the dashboard chart needs.
+    # Built once per inventory version; a new version builds a new instance.
+
+    def __init__(self, df):
+        self.by_product_status = df.groupby(["Product", "Status"], observed=True, sort=False)["Stock Qty"].sum()
+        self.rows = len(df)
+        self._by_product = self.by_product_status.groupby(level=0, sort=False).sum().sort_values(ascending=False)
+
+    def by_product(self):
+        return self._by_product
+
+    def chart_data(self, top=TOP_PRODUCTS):
+        # Top products by stock; everything else becomes one "Other" bar per status
+        data = self.by_product_status.rename("Stock Qty").reset_index()
+        data["Product"] = data["Product"].astype(str)
+        keep = set(self.by_product().index[:top].astype(str))
+        data.loc[~data["Product"].isin(keep), "Product"] = OTHER
+        return data.groupby(["Product", "Status"], sort=False, as_index=False)["Stock Qty"].sum()
+
+
+_metrics = VersionedCache(InventoryMetrics)
+
+
+def metrics_for(market, version, df):
+    return _metrics.get(market, version, df)
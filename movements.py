@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+TOP_CORRIDORS = 25
+REGION_COLUMNS = ["Region", "Cluster"]   # first one present in the inventory is used
+
+
+# ------------------ MOVEMENT MATRIX -----------------
+class MovementMatrix:
+    # Sparse (From, To) -> Qty view of a transfer plan. Lines are sorted once by
+    # corridor so each corridor's SKU lines are one contiguous slice; only
+    # non-zero corridors are ever materialised.
+
+    def __init__(self, plan):
+        codes, self.stores = pd.factorize(pd.concat([plan["From"], plan["To"]]).astype(str), sort=True)
+        n = len(self.stores)
+        keys = codes[:len(plan)].astype("int64") * n + codes[len(plan):]
+        order = np.argsort(keys, kind="stable")
+        self.lines = plan.iloc[order].reset_index(drop=True)
+
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype="int64")
+        ends = np.r_[starts[1:], len(keys)].astype("int64")
+        qty = np.add.reduceat(self.lines["Qty"].to_numpy(dtype="int64"), starts) if len(keys) else starts
+        self.corridors = pd.DataFrame({
+            "From": self.stores[keys[starts] // n] if len(keys) else [],
+            "To": self.stores[keys[starts] % n] if len(keys) else [],
+            "Qty": qty,
+            "Lines": ends - starts,
+        })
+        # (From, To) -> slice of self.lines, for drill-down without re-filtering
+        self._slices = {(f, t): (s, e) for f, t, s, e in zip(self.corridors["From"], self.corridors["To"], starts, ends)}
+
+    def __len__(self):
+        return len(self.corridors)
+
+    def top(self, n=TOP_CORRIDORS):
+        return self.corridors.nlargest(n, "Qty").reset_index(drop=True)
+
+    def lines_for(self, from_store, to_store):
+        start, end = self._slices.get((str(from_store), str(to_store)), (0, 0))
+        return self.lines.iloc[start:end]
+
+    def pivot(self, stores=None):
+        # Dense From x To table, only for the stores asked for (e.g. the top corridors)
+        corridors = self.corridors
+        if stores is not None:
+            corridors = corridors[corridors["From"].isin(stores) & corridors["To"].isin(stores)]
+        return corridors.pivot_table(index="From", columns="To", values="Qty", aggfunc="sum", fill_value=0)
+
+    def by_region(self, regions):
+        # regions: store -> region mapping (dict or Series); unmapped stores stay on their own
+        regions = pd.Series(regions)
+        regions.index = regions.index.astype(str)
+        clustered = self.corridors.assign(
+            From=self.corridors["From"].map(regions).fillna(self.corridors["From"]),
+            To=self.corridors["To"].map(regions).fillna(self.corridors["To"]),
+        )
+        return clustered.groupby(["From", "To"], as_index=False)[["Qty", "Lines"]].sum()
+
+
+def store_regions(inventory):
+    # Store -> region from the inventory, if it carries a region/cluster column
+    for column in REGION_COLUMNS:
+        if column in inventory:
+            return inventory[["Store", column]].drop_duplicates("Store").set_index("Store")[column].astype(str)
+    return None
@@ -0,0 +1,236 @@
+import os
+
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from features import FEATURE_FILE, demand_rate, load_features
+from inventory_cache import VersionedCache
+from profiling import POOL_CONTEXT, instrumented
+from shipping import COST_FILE, MISSING_UNIT_COST, consolidate, load_cost_matrix
+
+# Default planning constraints, matching the preloading stages in sts.py
+WEEKS_OF_COVER = 2          # receivers are topped up to this many weeks of sales
+MIN_DONOR_STOCK = 2         # donors keep at least this many units on the floor
+MIN_LIVE_DAYS = 0           # donors must have been live this long before giving stock
+SKUS_PER_TASK = 500         # subproblems shipped to a worker at a time
+
+OPTIMIZER_COLUMNS = ["SKU", "Product", "From", "To", "Qty", "Cost", "Submitted At", "Status"]
+
+
+# ------------------ SUPPLY / DEMAND -----------------
+def supply_and_demand(df, weeks_cover=WEEKS_OF_COVER, min_donor_stock=MIN_DONOR_STOCK,
+                      min_live_days=MIN_LIVE_DAYS, store_capacity=None, eligible=None):
+    # Surplus and deficit per (Store, SKU) row, computed for the whole market at once.
+    # min_donor_stock may be a per-row array; eligible masks rows allowed to donate.
+    stock = df["Stock Qty"].fillna(0).to_numpy(dtype="int64")
+    sales = demand_rate(df)
+    target = np.ceil(weeks_cover * sales).astype("int64")
+
+    supply = np.maximum(stock - np.maximum(target, min_donor_stock), 0)
+    if min_live_days and "Days Live" in df.columns:
+        supply[df["Days Live"].fillna(0).to_numpy() < min_live_days] = 0
+    if eligible is not None:
+        supply[~np.asarray(eligible, dtype=bool)] = 0
+    demand = np.maximum(target - stock, 0)
+
+    # Store capacity couples SKUs, so spread each store's headroom over its
+    # SKUs in proportion to demand before splitting the problem per SKU.
+    if store_capacity is not None:
+        headroom = df["Store"].map(store_capacity).to_numpy(dtype="float64")
+        total = pd.Series(demand).groupby(df["Store"].to_numpy()).transform("sum").to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scale = np.where(np.isnan(headroom) | (total == 0), 1.0,
+                             np.clip(headroom / total, 0.0, 1.0))
+        demand = np.floor(demand * scale).astype("int64")
+
+    return supply, demand
+
+
+# ------------------ SOLVERS -------------------------
+def solve_greedy(supply, demand, cost):
+    # Fill donors in order: rows arrive sorted by sales, so the slowest
+    # sellers feed the fastest ones first. Cost only rules corridors in or out.
+    flows = []
+    demand = demand.copy()
+    for i, left in enumerate(supply):
+        for j in np.flatnonzero(np.isfinite(cost[i]) & (demand > 0)):
+            qty = min(left, demand[j])
+            flows.append((i, j, qty))
+            demand[j] -= qty
+            left -= qty
+            if left == 0:
+                break
+    return flows
+
+
+def solve_min_cost(supply, demand, cost):
+    # Successive shortest paths on the bipartite transportation graph.
+    # Bellman-Ford relaxations run as dense NumPy ops over the donor x receiver block.
+    supply = supply.astype("int64")
+    demand = demand.astype("int64")
+    flow = np.zeros(cost.shape, dtype="int64")
+    n_donors, n_receivers = cost.shape
+
+    while supply.sum() > 0 and demand.sum() > 0:
+        dist_d = np.where(supply > 0, 0.0, np.inf)
+        pred_d = np.full(n_donors, -1)
+        dist_r = np.full(n_receivers, np.inf)
+        pred_r = np.zeros(n_receivers, dtype="int64")
+        for _ in range(n_donors + n_receivers):
+            # Only strict improvements move a pointer, so ties cannot form zero-cost loops
+            reach = dist_d[:, None] + cost
+            best_d = reach.argmin(axis=0)
+            best = reach[best_d, np.arange(n_receivers)]
+            closer = best < dist_r - 1e-9
+            dist_r = np.where(closer, best, dist_r)
+            pred_r = np.where(closer, best_d, pred_r)
+            with np.errstate(invalid="ignore"):
+                back = np.where(flow > 0, dist_r[None, :] - cost, np.inf)
+            best_r = back.argmin(axis=1)
+            best = back[np.arange(n_donors), best_r]
+            better = best < dist_d - 1e-9
+            if not better.any():
+                break
+            dist_d = np.where(better, best, dist_d)
+            pred_d = np.where(better, best_r, pred_d)
+
+        open_r = np.flatnonzero((demand > 0) & np.isfinite(dist_r))
+        if len(open_r) == 0:
+            break
+        end = open_r[dist_r[open_r].argmin()]
+
+        # Walk back to a donor with spare supply, collecting the path
+        path = []
+        r = end
+        while True:
+            d = pred_r[r]
+            path.append((d, r))
+            if pred_d[d] < 0:
+                break
+            r = pred_d[d]
+        qty = min(supply[path[-1][0]], demand[end])
+        for d, r in path[:-1]:
+            qty = min(qty, flow[d, pred_d[d]])
+
+        for k, (d, r) in enumerate(path):
+            flow[d, r] += qty
+            if k < len(path) - 1:
+                flow[d, pred_d[d]] -= qty
+        supply[path[-1][0]] -= qty
+        demand[end] -= qty
+
+    donors, receivers = np.nonzero(flow)
+    return [(i, j, flow[i, j]) for i, j in zip(donors, receivers)]
+
+
+# Solvers take (supply, demand, cost) arrays and return (donor, receiver, qty) triples
+SOLVERS = {
+    "greedy": solve_greedy,
+    "mincost": solve_min_cost,
+}
+
+
+# ------------------ DECOMPOSITION -------------------
+def _solve_chunk(solver, cost_matrix, subproblems):
+    solve = SOLVERS[solver]
+    out = []
+    for sku, donors, supply, receivers, demand in subproblems:
+        cost = cost_matrix[np.ix_(donors, receivers)]
+        for i, j, qty in solve(supply, demand, cost):
+            if qty > 0:
+                out.append((sku, donors[i], receivers[j], int(qty), float(cost[i, j])))
+    return out
+
+
+def _subproblems(df, supply, demand, store_codes):
+    sku_codes, skus = pd.factorize(df["SKU"], sort=True)
+    sales = demand_rate(df)
+    active = (sku_codes >= 0) & ((supply > 0) | (demand > 0))
+    rows = np.flatnonzero(active)
+    rows = rows[np.lexsort((sales[rows], sku_codes[rows]))]
+    bounds = np.flatnonzero(np.diff(sku_codes[rows])) + 1
+
+    for block in np.split(rows, bounds):
+        if len(block) == 0:
+            continue
+        donors = block[supply[block] > 0]
+        receivers = block[demand[block] > 0][::-1]
+        if len(donors) and len(receivers):
+            yield (skus[sku_codes[block[0]]], store_codes[donors], supply[donors],
+                   store_codes[receivers], demand[receivers], donors)
+
+
+@instrumented("suggest: optimizer")
+def optimize_transfers(df, solver="greedy", cost_matrix=None, max_unit_cost=None,
+                       max_workers=None, **constraints):
+    # Multi-donor / multi-receiver transfer plan. The market is decomposed per
+    # SKU and the subproblems are solved in parallel worker processes.
+    if df.empty:
+        return pd.DataFrame(columns=OPTIMIZER_COLUMNS)
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver '{solver}'. Available: {', '.join(SOLVERS)}")
+
+    supply, demand = supply_and_demand(df, **constraints)
+    store_codes, stores = pd.factorize(df["Store"])
+
+    # Dense store x store unit cost; missing corridors cost MISSING_UNIT_COST, as in shipping.consolidate
+    if cost_matrix is None:
+        costs = np.full((len(stores), len(stores)), MISSING_UNIT_COST)
+    else:
+        costs = cost_matrix.reindex(index=stores, columns=stores).to_numpy(dtype="float64")
+        costs = np.where(np.isnan(costs), MISSING_UNIT_COST, costs)
+    if max_unit_cost is not None:
+        costs = np.where(costs > max_unit_cost, np.inf, costs)
+    np.fill_diagonal(costs, np.inf)
+
+    products = {}
+    subproblems = []
+    for sku, donors, sup, receivers, dem, donor_rows in _subproblems(df, supply, demand, store_codes):
+        products[sku] = df["Product"].iat[donor_rows[0]]
+        subproblems.append((sku, donors, sup, receivers, dem))
+
+    chunks = [subproblems[k:k + SKUS_PER_TASK] for k in range(0, len(subproblems), SKUS_PER_TASK)]
+    lines = []
+    if max_workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            lines.extend(_solve_chunk(solver, costs, chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=POOL_CONTEXT) as pool:
+            for result in pool.map(_solve_chunk, [solver] * len(chunks), [costs] * len(chunks), chunks):
+                lines.extend(result)
+
+    plan = pd.DataFrame(lines, columns=["SKU", "From", "To", "Qty", "Cost"])
+    plan.insert(1, "Product", plan["SKU"].map(products))
+    plan["From"] = stores.to_numpy()[plan["From"].to_numpy(dtype="int64")]
+    plan["To"] = stores.to_numpy()[plan["To"].to_numpy(dtype="int64")]
+    plan["Cost"] = plan["Cost"] * plan["Qty"]
+    plan["Submitted At"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    plan["Status"] = "Suggested"
+    return plan
+
+
+# ------------------ SHARED PLANS --------------------
+def optimized_plan(df, solver="greedy"):
+    # The apps' optimized suggestions: receivers are sized on multi-week velocity
+    # when the weekly feature store exists, and the plan ships one consignment per
+    # corridor (see shipping.consolidate). Returns (kept lines, shipments).
+    features = load_features()
+    if features is not None:
+        df = features.enrich(df)
+    return consolidate(optimize_transfers(df, solver=solver), load_cost_matrix(), df)
+
+
+def _file_version(path):
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+
+_plans = VersionedCache(optimized_plan)
+
+
+def plan_for(market, version, df, solver="greedy"):
+    # One plan per (market, solver), replanned when the inventory version, the
+    # feature store or the cost file changes
+    key = (version, _file_version(FEATURE_FILE), _file_version(COST_FILE))
+    return _plans.get((market, solver), key, df, solver)
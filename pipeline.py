@@ -0,0 +1,191 @@
+import time
+
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from features import FEATURE_FILE, demand_rate, load_features
+from optimizer import optimize_transfers, MIN_DONOR_STOCK, MIN_LIVE_DAYS
+from profiling import POOL_CONTEXT
+from shipping import (CARTON_SIZE, COST_FILE, MIN_SHIPMENT_QTY, as_cost_matrix, consolidate,
+                      load_cost_matrix)
+
+LIQUIDATION_WEEKS_OF_COVER = 12   # more cover than this marks a liquidation candidate
+PIVOTAL_STOCK = 4                 # floor kept at donors for rows flagged as pivotal sizes
+
+
+# ------------------ STAGES --------------------------
+def pull_sales(inventory, features_file=FEATURE_FILE):
+    # Joins multi-week velocity, cover, sell-through and days live from the
+    # feature store when one has been built
+    df = inventory.copy()
+    df["Stock Qty"] = df["Stock Qty"].fillna(0).astype("int64")
+    df["Sales Last Week"] = df["Sales Last Week"].fillna(0)
+    features = load_features(features_file) if features_file else None
+    if features is not None:
+        df = features.enrich(df)
+    return df.reset_index(drop=True)
+
+
+def check_store_capacity(sales):
+    # Headroom per store; None when the data has no "Store Capacity" column
+    if "Store Capacity" not in sales.columns:
+        return None
+    by_store = sales.groupby("Store", observed=True).agg(capacity=("Store Capacity", "max"), stock=("Stock Qty", "sum"))
+    return (by_store["capacity"] - by_store["stock"]).clip(lower=0).to_dict()
+
+
+def sales_duration_ranking(sales):
+    # Rank stores within each SKU by weekly sales rate: feature-store velocity when
+    # joined, else last week's sales normalised by days live when known
+    rate = pd.Series(demand_rate(sales), index=sales.index)
+    if "Velocity" not in sales.columns and "Days Live" in sales.columns:
+        rate = rate * 7 / sales["Days Live"].clip(lower=7).fillna(7)
+    return rate.groupby(sales["SKU"], observed=True).rank(method="first", ascending=False).astype("int64")
+
+
+def share_of_business(sales):
+    rate = pd.Series(demand_rate(sales), index=sales.index)
+    total = rate.groupby(sales["Store"], observed=True).transform("sum")
+    return (rate / total.replace(0, np.nan)).fillna(0.0)
+
+
+def discount_benchmark(sales):
+    # Rows carrying more cover than the liquidation benchmark
+    weekly = pd.Series(demand_rate(sales), index=sales.index)
+    cover = sales["Stock Qty"] / weekly.where(weekly > 0)
+    return (cover.isna() & (sales["Stock Qty"] > 0)) | (cover > LIQUIDATION_WEEKS_OF_COVER)
+
+
+def pivotal_size_availability(sales):
+    # Donor floor per row: pivotal rows keep more stock on the shelf
+    floor = np.full(len(sales), MIN_DONOR_STOCK, dtype="int64")
+    if "Pivotal" in sales.columns:
+        floor[sales["Pivotal"].fillna(False).to_numpy(dtype=bool)] = PIVOTAL_STOCK
+    return floor
+
+
+def minimum_live_days(sales, min_live_days=MIN_LIVE_DAYS):
+    if "Days Live" not in sales.columns:
+        return np.ones(len(sales), dtype=bool)
+    return sales["Days Live"].fillna(0).to_numpy() >= min_live_days
+
+
+def transfer_cost(sales, cost_matrix=None, cost_file=COST_FILE):
+    # Store-to-store costs from the given matrix, else from the local cost file
+    return as_cost_matrix(cost_matrix) if cost_matrix is not None else load_cost_matrix(cost_file)
+
+
+def optimize(sales, capacity, pivotal, live_days, cost, solver="greedy"):
+    unit_costs = None if cost is None else cost.unit_costs()
+    return optimize_transfers(sales, solver=solver, cost_matrix=unit_costs, max_workers=1,
+                              store_capacity=capacity, min_donor_stock=pivotal, eligible=live_days)
+
+
+def consolidate_shipments(plan, cost, sales, carton_size=CARTON_SIZE, min_shipment_qty=MIN_SHIPMENT_QTY):
+    # One shipment per corridor; corridors too small or costing more than the
+    # receivers' extra sales earn are dropped
+    lines, _ = consolidate(plan, cost, sales, carton_size=carton_size, min_shipment_qty=min_shipment_qty)
+    return lines
+
+
+def final_recommendations(plan, sales, ranking, share, discount):
+    if plan.empty:
+        return plan
+    keys = sales[["Store", "SKU"]].assign(Rank=ranking, Share=share, Liquidate=discount)
+    keys = keys.drop_duplicates(["Store", "SKU"])
+    donor = keys.rename(columns={"Store": "From", "Liquidate": "Liquidation Candidate"})
+    receiver = keys.rename(columns={"Store": "To", "Rank": "Receiver Rank", "Share": "Receiver Share"})
+    out = plan.merge(donor[["From", "SKU", "Liquidation Candidate"]], on=["From", "SKU"], how="left")
+    out = out.merge(receiver[["To", "SKU", "Receiver Rank", "Receiver Share"]], on=["To", "SKU"], how="left")
+    return out.sort_values(["Receiver Rank", "Qty"], ascending=[True, False], ignore_index=True)
+
+
+# Stage key, label shown in the UI, function, upstream stage keys
+STAGES = [
+    ("sales", "Pulling Sales Data...", pull_sales, ["inventory"]),
+    ("capacity", "Checking Store Capacity...", check_store_capacity, ["sales"]),
+    ("ranking", "Processing Sales Duration for Store-Style Ranking...", sales_duration_ranking, ["sales"]),
+    ("share", "Calculating Share of Business...", share_of_business, ["sales"]),
+    ("discount", "Evaluating Discount Benchmark for Liquidation...", discount_benchmark, ["sales"]),
+    ("pivotal", "Assessing Pivotal Size Availability...", pivotal_size_availability, ["sales"]),
+    ("live_days", "Validating Minimum Live Days...", minimum_live_days, ["sales"]),
+    ("cost", "Calculating Transfer Cost...", transfer_cost, ["sales"]),
+    ("optimize", "Optimizing...", optimize, ["sales", "capacity", "pivotal", "live_days", "cost"]),
+    ("consolidate", "Consolidating Shipments...", consolidate_shipments, ["optimize", "cost", "sales"]),
+    ("recommend", "Generating Final Recommendations...", final_recommendations,
+     ["consolidate", "sales", "ranking", "share", "discount"]),
+]
+
+# Extra keyword arguments a stage accepts from run_pipeline()
+STAGE_OPTIONS = {
+    "sales": ["features_file"],
+    "live_days": ["min_live_days"],
+    "cost": ["cost_matrix", "cost_file"],
+    "optimize": ["solver"],
+    "consolidate": ["carton_size", "min_shipment_qty"],
+}
+
+
+# ------------------ DAG RUNNER ----------------------
+def _run_stage(func, args, kwargs):
+    start = time.perf_counter()
+    value = func(*args, **kwargs)
+    return value, time.perf_counter() - start
+
+
+def partition_inventory(inventory, partition_by=None):
+    # Independent slices of the market, e.g. by "Market" or a store "Cluster" column
+    if partition_by is None or partition_by not in inventory.columns:
+        return {"All": inventory}
+    return {key: part for key, part in inventory.groupby(partition_by, sort=True, observed=True)}
+
+
+def run_pipeline(inventory, on_progress=None, partition_by=None, max_workers=None, **options):
+    # Runs every stage for every partition. A stage is submitted as soon as its
+    # upstream stages are done, so independent stages and partitions share the pool.
+    partitions = partition_inventory(inventory, partition_by)
+    results = {part: {"inventory": df} for part, df in partitions.items()}
+    timings = {part: {} for part in partitions}
+    pending = [(part, stage) for part in partitions for stage in STAGES]
+    total = len(pending)
+    done = 0
+
+    def ready(part, deps):
+        return all(dep in results[part] for dep in deps)
+
+    def task(part, stage):
+        key, _, func, deps = stage
+        args = [results[part][dep] for dep in deps]
+        kwargs = {opt: options[opt] for opt in STAGE_OPTIONS.get(key, []) if opt in options}
+        return func, args, kwargs
+
+    def finished(part, stage, outcome):
+        nonlocal done
+        results[part][stage[0]], timings[part][stage[0]] = outcome
+        done += 1
+        if on_progress:
+            on_progress(done, total, stage[1] if len(partitions) == 1 else f"{part}: {stage[1]}")
+
+    if max_workers == 1:
+        # STAGES is already in dependency order
+        for part, stage in pending:
+            finished(part, stage, _run_stage(*task(part, stage)))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=POOL_CONTEXT) as pool:
+            running = {}
+            while pending or running:
+                for part, stage in [p for p in pending if ready(p[0], p[1][3])]:
+                    pending.remove((part, stage))
+                    running[pool.submit(_run_stage, *task(part, stage))] = (part, stage)
+                complete, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in complete:
+                    part, stage = running.pop(future)
+                    finished(part, stage, future.result())
+
+    recommendations = [results[part]["recommend"].assign(Partition=part) for part in partitions]
+    return {
+        "recommendations": pd.concat(recommendations, ignore_index=True),
+        "partitions": {part: {k: v for k, v in res.items() if k != "inventory"} for part, res in results.items()},
+        "timings": timings,
+    }
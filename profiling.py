@@ -0,0 +1,129 @@
+import cProfile
+import functools
+import io
+import json
+import multiprocessing
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+MAX_RECORDS = 2000      # most recent spans kept in memory, across all sessions
+PROFILE_LINES = 40      # functions shown from a cProfile capture
+
+RECORD_COLUMNS = ["Stage", "Seconds", "Rows", "Memory Delta MB", "At"]
+
+_records = deque(maxlen=MAX_RECORDS)
+_lock = threading.Lock()
+
+# Process pools are started from Streamlit server threads. A forked child copies
+# _lock as it was, so forking while another session's thread holds it leaves the
+# child's @instrumented calls waiting forever; workers start from a clean process.
+POOL_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+_page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss():
+    # Resident memory in bytes; statm is cheap to read, unlike a tracemalloc run
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _page_size
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# ------------------ SPANS ---------------------------
+@contextmanager
+def timed(stage, rows=None):
+    # Records wall time and RSS change of the block; set span["rows"] inside
+    # the block when the row count is only known there.
+    span = {"rows": rows}
+    memory = _rss()
+    start = time.perf_counter()
+    try:
+        yield span
+    finally:
+        record = {
+            "Stage": stage,
+            "Seconds": time.perf_counter() - start,
+            "Rows": span["rows"],
+            "Memory Delta MB": (_rss() - memory) / 2**20,
+            "At": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        with _lock:
+            _records.append(record)
+
+
+def instrumented(stage, rows=None):
+    # Decorator form of timed(). Rows processed default to the length of the
+    # first argument; rows(result) overrides that.
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(stage) as span:
+                result = func(*args, **kwargs)
+                try:
+                    span["rows"] = rows(result) if rows is not None else len(args[0])
+                except (TypeError, IndexError):
+                    pass
+                return result
+        return wrapper
+    return decorate
+
+
+def records():
+    with _lock:
+        return pd.DataFrame(list(_records), columns=RECORD_COLUMNS)
+
+
+def clear():
+    with _lock:
+        _records.clear()
+
+
+def summary():
+    # Per-stage totals, slowest first
+    df = records()
+    if df.empty:
+        return df
+    out = df.groupby("Stage").agg(
+        Calls=("Seconds", "size"), Total=("Seconds", "sum"), Mean=("Seconds", "mean"), Max=("Seconds", "max"),
+        Rows=("Rows", "sum"), Memory=("Memory Delta MB", "sum"),
+    )
+    out["Rows/s"] = (out["Rows"] / out["Total"].where(out["Total"] > 0)).fillna(0).round(0)
+    return out.sort_values("Total", ascending=False).rename(columns={"Memory": "Memory Delta MB"})
+
+
+# ------------------ EXPORT --------------------------
+def export_json():
+    return json.dumps(records().to_dict("records"), indent=2, default=str)
+
+
+def export_csv():
+    return records().to_csv(index=False)
+
+
+# ------------------ CPROFILE ------------------------
+@contextmanager
+def profiled(enabled=True, lines=PROFILE_LINES):
+    # cProfile of the block when enabled; capture["stats"] holds the text report
+    capture = {"stats": None}
+    if not enabled:
+        yield capture
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield capture
+    finally:
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(lines)
+        capture["stats"] = out.getvalue()
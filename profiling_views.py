@@ -0,0 +1,51 @@
+from contextlib import contextmanager
+
+import streamlit as st
+
+from profiling import clear, export_csv, export_json, profiled, records, summary, timed
+
+ADMIN_ROLES = {"Approver"}
+
+
+def is_admin():
+    return st.session_state.get("role") in ADMIN_ROLES
+
+
+# ------------------ RERUN CAPTURE -------------------
+@contextmanager
+def instrumented_rerun(page):
+    # Times rendering of the page and, when requested from the panel,
+    # profiles this one rerun with cProfile
+    with profiled(st.session_state.pop("profile_next_rerun", False)) as capture:
+        with timed(f"render: {page}"):
+            yield
+    if capture["stats"]:
+        st.session_state.profile_stats = (page, capture["stats"])
+
+
+# ------------------ ADMIN PANEL ---------------------
+def profiling_panel():
+    # Sidebar panel for admins only; drawn after the page so it includes this rerun
+    if not is_admin():
+        return
+    with st.sidebar.expander("⏱️ Performance"):
+        stages = summary()
+        if stages.empty:
+            st.caption("No timings recorded yet.")
+        else:
+            st.dataframe(stages.round(3))
+            st.download_button("Export JSON", export_json(), file_name="timings.json", mime="application/json")
+            st.download_button("Export CSV", export_csv(), file_name="timings.csv", mime="text/csv")
+            if st.checkbox("Show recent spans"):
+                st.dataframe(records().tail(50).iloc[::-1], hide_index=True)
+            if st.button("Clear timings"):
+                clear()
+                st.rerun()
+
+        if st.button("Profile next rerun"):
+            st.session_state.profile_next_rerun = True
+            st.rerun()
+        if "profile_stats" in st.session_state:
+            page, stats = st.session_state.profile_stats
+            st.caption(f"cProfile of one rerun: {page}")
+            st.code(stats, language="text")
@@ -0,0 +1,119 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from profiling import instrumented
+from snapshots import load_snapshot, save_snapshot, snapshot_version
+from transfer_store import DB_FILE, list_transfers, save_inventory, transition, versions, write_transaction
+
+INVENTORY_COLUMNS = ["Store", "SKU", "Product", "Stock Qty", "Sales Last Week"]
+
+
+# ------------------ BULK RECEIVE --------------------
+def _codes(column, values):
+    # Integer codes for an inventory key column and for the received values.
+    # Categorical columns reuse their codes; unknown values come back as -1.
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        categories = column.cat.categories.astype(str)
+        return column.cat.codes.to_numpy(dtype="int64"), categories.get_indexer(values), len(categories)
+    codes, uniques = pd.factorize(np.concatenate([column.astype(str).to_numpy(), np.asarray(values, dtype=object)]))
+    return codes[:len(column)], codes[len(column):], len(uniques)
+
+
+@instrumented("receive")
+def apply_receipts(inventory, transfers):
+    # Adds received quantities to a new copy of the inventory. Lines are summed
+    # per (To, SKU) first, then matched against (Store, SKU) in one indexed pass;
+    # pairs the store has never stocked are appended as new rows.
+    if inventory.empty:
+        inventory = pd.DataFrame({c: pd.Series(dtype="int32" if c in ("Stock Qty", "Sales Last Week") else object)
+                                  for c in INVENTORY_COLUMNS})
+    lines = pd.DataFrame({
+        "Store": transfers["To"].astype(str).to_numpy(),
+        "SKU": transfers["SKU"].astype(str).to_numpy(),
+        "Product": transfers["Product"].to_numpy() if "Product" in transfers else None,
+        "Qty": transfers["Qty"].astype("int64").to_numpy(),
+    })
+    receipts = lines.groupby(["Store", "SKU"], sort=False).agg(Qty=("Qty", "sum"), Product=("Product", "first"))
+
+    store_rows, store_lines, _ = _codes(inventory["Store"], receipts.index.get_level_values("Store"))
+    sku_rows, sku_lines, n_skus = _codes(inventory["SKU"], receipts.index.get_level_values("SKU"))
+    keys = np.where((store_rows < 0) | (sku_rows < 0), -1, store_rows * n_skus + sku_rows)
+    line_keys = np.where((store_lines < 0) | (sku_lines < 0), -2, store_lines * n_skus + sku_lines)
+    known = line_keys >= 0
+    added = pd.Series(receipts["Qty"].to_numpy()[known], index=line_keys[known])
+    added = added.reindex(keys).fillna(0).to_numpy(dtype="int64")
+    updated = inventory.copy()
+    stock = updated["Stock Qty"]
+    updated["Stock Qty"] = (stock.fillna(0).to_numpy(dtype="int64") + added).astype(stock.dtype if stock.dtype != object else "int64")
+
+    new = receipts[~pd.Index(line_keys).isin(keys)]
+    if new.empty:
+        return updated
+    rows = pd.DataFrame({
+        "Store": new.index.get_level_values("Store"),
+        "SKU": new.index.get_level_values("SKU"),
+        "Product": new["Product"].to_numpy(),
+        "Stock Qty": new["Qty"].to_numpy(),
+        "Sales Last Week": np.zeros(len(new), dtype="int64"),
+    })
+    for column in updated.columns:
+        if column not in rows.columns:
+            rows[column] = None
+        dtype = updated[column].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            # Widen the categories so the concatenated column stays categorical
+            missing = pd.Index(rows[column].dropna().unique()).difference(dtype.categories)
+            updated[column] = updated[column].cat.add_categories(missing)
+            rows[column] = pd.Categorical(rows[column], dtype=updated[column].dtype)
+        elif column in ("Stock Qty", "Sales Last Week"):
+            rows[column] = rows[column].astype(dtype)
+    return pd.concat([updated, rows[updated.columns]], ignore_index=True)
+
+
+def receive_approved(read_inventory, publish, to_location=None, db_file=DB_FILE):
+    # Receives every approved transfer (optionally for one store) inside one write
+    # transaction on the transfer database, so receives from the apps and the batch
+    # CLI run one at a time across processes. The inventory is read and updated
+    # with only the lines this call moved to Received, and handed to
+    # publish(inventory, received, conn) before the status changes commit: if
+    # publishing fails the lines stay Approved and are received again next time.
+    # Returns the received lines.
+    with write_transaction(db_file) as conn:
+        approved = list_transfers(status="Approved", to_location=to_location, db_file=db_file)
+        if not approved:
+            return []
+        moved, _ = transition(versions(approved), "Received", conn=conn)
+        moved = set(moved)
+        received = [r for r in approved if r["ID"] in moved]
+        if received:
+            publish(apply_receipts(read_inventory(), pd.DataFrame(received)), received, conn)
+        return received
+
+
+# ------------------ BATCH ENTRY POINT ---------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Receive approved store-to-store transfers into an inventory snapshot.")
+    parser.add_argument("--snapshot", default="store_inventory", help="inventory snapshot name")
+    parser.add_argument("--store", default=None, help="only receive transfers into this store")
+    parser.add_argument("--db", default=DB_FILE, help="transfer database")
+    args = parser.parse_args(argv)
+
+    def publish(inventory, received, conn):
+        # The snapshot the apps reload, plus the per-store table their dashboards read
+        before = snapshot_version(args.snapshot)
+        save_snapshot(inventory, args.snapshot)
+        after = snapshot_version(args.snapshot)
+        if args.store is None:
+            save_inventory(inventory, conn=conn, source=after)
+        else:
+            save_inventory(inventory[inventory["Store"].astype(str) == args.store], stores=[args.store], conn=conn,
+                           source=after, based_on=before)
+
+    received = receive_approved(lambda: load_snapshot(args.snapshot), publish, args.store, args.db)
+    print(f"Received {len(received)} transfer lines ({sum(int(r['Qty']) for r in received)} units).")
+
+
+if __name__ == "__main__":
+    main()
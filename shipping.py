@@ -0,0 +1,162 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from features import demand_rate
+
+COST_FILE = "data/transfer_costs.csv"   # From, To, Shipment Cost, Carton Cost per store pair
+CARTON_SIZE = 12          # units per carton
+MIN_SHIPMENT_QTY = 6      # corridors moving fewer units than this are not shipped
+UNIT_MARGIN = 8.0         # margin earned per extra unit the receiver sells; an "Uplift" column on the plan overrides it
+UPLIFT_WEEKS = 4          # weeks of receiver demand a transfer can sell into
+MISSING_UNIT_COST = 1.0   # per unit, no shipment charge, for pairs the cost data does not list (as optimize_transfers assumes)
+
+SHIP = "Ship"
+SHIPMENT_COLUMNS = ["Shipment", "From", "To", "Lines", "Qty", "Cartons", "Cost", "Uplift", "Decision"]
+
+
+# ------------------ COST MATRIX ---------------------
+class CostMatrix:
+    # Dense store x store arrays, looked up with integer store codes.
+    # Pairs missing from the source file are NaN and priced at MISSING_UNIT_COST.
+
+    def __init__(self, stores, shipment, carton):
+        self.stores = pd.Index(stores).astype(str)
+        self.shipment = shipment
+        self.carton = carton
+
+    def codes(self, stores):
+        return self.stores.get_indexer(pd.Index(stores).astype(str))
+
+    def lookup(self, from_stores, to_stores, carton_size=CARTON_SIZE):
+        # Vectorised (shipment cost, carton cost) per pair; unlisted pairs and
+        # unknown stores cost MISSING_UNIT_COST per unit and nothing per shipment
+        f, t = self.codes(from_stores), self.codes(to_stores)
+        known = (f >= 0) & (t >= 0)
+        shipment = np.full(len(f), np.nan)
+        carton = np.full(len(f), np.nan)
+        shipment[known] = self.shipment[f[known], t[known]]
+        carton[known] = self.carton[f[known], t[known]]
+        missing = np.isnan(shipment) | np.isnan(carton)
+        shipment[missing] = 0.0
+        carton[missing] = MISSING_UNIT_COST * carton_size
+        return shipment, carton
+
+    def unit_costs(self, carton_size=CARTON_SIZE):
+        # Marginal cost per unit, the shape optimize_transfers takes as cost_matrix;
+        # unlisted pairs stay NaN so the optimizer applies MISSING_UNIT_COST too
+        return pd.DataFrame(self.carton / carton_size, index=self.stores, columns=self.stores)
+
+
+def cost_matrix_from_frame(df):
+    # Long format: one row per (From, To) with Shipment Cost and Carton Cost
+    codes, stores = pd.factorize(pd.concat([df["From"], df["To"]]).astype(str))
+    n = len(stores)
+    shipment = np.full((n, n), np.nan)
+    carton = np.full((n, n), np.nan)
+    f, t = codes[:len(df)], codes[len(df):]
+    shipment[f, t] = df["Shipment Cost"].to_numpy(dtype="float64")
+    carton[f, t] = df["Carton Cost"].to_numpy(dtype="float64")
+    return CostMatrix(stores, shipment, carton)
+
+
+def as_cost_matrix(cost_matrix, carton_size=CARTON_SIZE):
+    # Accepts a CostMatrix or a store x store unit-cost DataFrame with free shipments
+    if cost_matrix is None or isinstance(cost_matrix, CostMatrix):
+        return cost_matrix
+    unit = cost_matrix.reindex(columns=cost_matrix.index).to_numpy(dtype="float64")
+    return CostMatrix(cost_matrix.index, np.zeros_like(unit), unit * carton_size)
+
+
+@lru_cache(maxsize=4)
+def _load(path, mtime):
+    return cost_matrix_from_frame(pd.read_csv(path, dtype={"From": str, "To": str}))
+
+
+def load_cost_matrix(path=COST_FILE):
+    # Parsed once per file version; None when no cost file is present
+    if not os.path.exists(path):
+        return None
+    return _load(path, os.path.getmtime(path))
+
+
+# ------------------ UPLIFT -------------------------
+def sales_uplift(plan, sales, unit_margin=UNIT_MARGIN, weeks=UPLIFT_WEEKS):
+    # Margin from the units each line should sell at its receiver: what all lines
+    # into a (To, SKU) bring is capped by that row's demand over the window, and
+    # shared between the lines in proportion to their quantity
+    demand = pd.Series(demand_rate(sales) * weeks,
+                       index=pd.MultiIndex.from_arrays([sales["Store"].astype(str), sales["SKU"].astype(str)]))
+    demand = demand.groupby(level=[0, 1]).sum()
+    keys = pd.MultiIndex.from_arrays([plan["To"].astype(str), plan["SKU"].astype(str)])
+    receiver_demand = demand.reindex(keys).fillna(0).to_numpy()
+    qty = plan["Qty"].to_numpy(dtype="float64")
+    inbound = pd.Series(qty).groupby(keys.codes[0].astype("int64") * len(keys.levels[1]) + keys.codes[1]).transform("sum")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sold = qty * np.minimum(1.0, np.where(inbound > 0, receiver_demand / inbound.to_numpy(), 0.0))
+    return sold * unit_margin
+
+
+# ------------------ CONSOLIDATION -------------------
+def consolidate(plan, costs=None, sales=None, carton_size=CARTON_SIZE, min_shipment_qty=MIN_SHIPMENT_QTY,
+                unit_margin=UNIT_MARGIN):
+    # Groups transfer lines into one shipment per (From, To) corridor, prices it
+    # as shipment cost + cartons x carton cost, and keeps only corridors that
+    # move enough units and earn more uplift than they cost. Uplift comes from
+    # receiver demand in sales (see sales_uplift); without sales every unit is
+    # assumed to sell. Returns the kept lines (with their shipment and a
+    # qty-weighted share of its cost) and the per-corridor decisions.
+    if plan.empty:
+        return plan.assign(Shipment=pd.Series(dtype="int64")), pd.DataFrame(columns=SHIPMENT_COLUMNS)
+
+    stores = pd.Index(pd.unique(pd.concat([plan["From"], plan["To"]]).astype(str)))
+    f = stores.get_indexer(plan["From"].astype(str))
+    t = stores.get_indexer(plan["To"].astype(str))
+    corridor, inverse = np.unique(f.astype("int64") * len(stores) + t, return_inverse=True)
+
+    qty = plan["Qty"].to_numpy(dtype="int64")
+    if "Uplift" in plan:
+        uplift = plan["Uplift"].to_numpy(dtype="float64")
+    elif sales is not None:
+        uplift = sales_uplift(plan, sales, unit_margin)
+    else:
+        uplift = qty * unit_margin
+    corridor_qty = np.bincount(inverse, weights=qty).astype("int64")
+    corridor_uplift = np.bincount(inverse, weights=uplift)
+    cartons = -(-corridor_qty // carton_size)
+
+    from_stores = stores[corridor // len(stores)]
+    to_stores = stores[corridor % len(stores)]
+    if costs is None:
+        # No cost data: every pair at MISSING_UNIT_COST, the same rule the optimizer uses
+        shipment_cost = np.zeros(len(corridor))
+        carton_cost = np.full(len(corridor), MISSING_UNIT_COST * carton_size)
+    else:
+        shipment_cost, carton_cost = costs.lookup(from_stores, to_stores, carton_size)
+    with np.errstate(invalid="ignore"):
+        cost = shipment_cost + cartons * carton_cost
+
+    decision = np.full(len(corridor), SHIP, dtype=object)
+    decision[cost > corridor_uplift] = "Cost exceeds uplift"
+    decision[corridor_qty < min_shipment_qty] = "Below minimum quantity"
+    decision[~np.isfinite(cost)] = "No route"      # listed as infinite, which the optimizer never uses either
+
+    shipments = pd.DataFrame({
+        "Shipment": np.arange(len(corridor)),
+        "From": from_stores,
+        "To": to_stores,
+        "Lines": np.bincount(inverse),
+        "Qty": corridor_qty,
+        "Cartons": cartons,
+        "Cost": cost,
+        "Uplift": corridor_uplift,
+        "Decision": decision,
+    })
+
+    keep = decision[inverse] == SHIP
+    lines = plan[keep].copy()
+    lines["Shipment"] = inverse[keep]
+    lines["Cost"] = cost[inverse[keep]] * qty[keep] / corridor_qty[inverse[keep]]
+    return lines.reset_index(drop=True), shipments
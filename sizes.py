@@ -0,0 +1,181 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from optimizer import MIN_DONOR_STOCK
+from ingest import compact_quantity
+from inventory_cache import VersionedCache
+from pipeline import PIVOTAL_STOCK
+from profiling import instrumented
+from suggestions import MAX_TRANSFER_QTY
+
+PIVOTAL_SALES_SHARE = 0.6    # sizes making up the first 60% of a style's sales are pivotal
+STYLE_ATTRIBUTES = ["Parent Style", "Style Desc", "Brand", "Sport", "Gender", "Season"]
+
+SIZE_SUGGESTION_COLUMNS = ["SKU", "Product", "From", "To", "Qty", "Style", "Size", "Pivotal",
+                           "Pre Stock", "Post Stock", "Submitted At", "Status"]
+
+
+# ------------------ SIZE MODEL ----------------------
+class SizeModel:
+    # Store x style x size inventory. Dimensions live in small lookup tables;
+    # the facts are four 4-byte arrays (sales is float32 only when fractional), one entry per (store, EAN) row:
+    #   stores: store names            styles: Style + STYLE_ATTRIBUTES
+    #   eans:   EAN Code, Size, style code, Pivotal flag
+
+    def __init__(self, stores, styles, eans, store, ean, stock, sales):
+        self.stores = stores
+        self.styles = styles
+        self.eans = eans
+        self.store = store
+        self.ean = ean
+        self.stock = stock
+        self.sales = sales
+
+    def __len__(self):
+        return len(self.store)
+
+    def nbytes(self):
+        facts = self.store.nbytes + self.ean.nbytes + self.stock.nbytes + self.sales.nbytes
+        dims = self.styles.memory_usage(deep=True).sum() + self.eans.memory_usage(deep=True).sum()
+        return int(facts + dims + self.stores.memory_usage(deep=True))
+
+    def style_inventory(self):
+        # SKU-level view (one row per store x style) for the existing engines
+        n_styles = len(self.styles)
+        keys = self.store.astype("int64") * n_styles + self.eans["Style Code"].to_numpy()[self.ean]
+        keys, inverse = np.unique(keys, return_inverse=True)
+        return pd.DataFrame({
+            "Store": self.stores[keys // n_styles],
+            "SKU": self.styles["Style"].to_numpy()[keys % n_styles],
+            "Stock Qty": np.bincount(inverse, weights=self.stock).astype("int64"),
+            "Sales Last Week": compact_quantity(np.bincount(inverse, weights=self.sales)).to_numpy(),
+        })
+
+
+def _ean_keys(df):
+    if "EAN Code" in df.columns:
+        return df["EAN Code"]
+    if "SKU" in df.columns:
+        return df["SKU"]
+    return pd.MultiIndex.from_arrays([df["Style"], df["Size"]])
+
+
+def pivotal_sizes(ean_style, ean_sales, share=PIVOTAL_SALES_SHARE):
+    # Per style, the best-selling sizes that together reach `share` of its sales
+    order = np.lexsort((-ean_sales, ean_style))
+    sales = ean_sales[order]
+    style = ean_style[order]
+    starts = np.flatnonzero(np.r_[True, style[1:] != style[:-1]]) if len(style) else np.array([], dtype="int64")
+    group = np.cumsum(np.r_[True, style[1:] != style[:-1]]) - 1 if len(style) else style
+    cumulative = np.cumsum(sales)
+    before = cumulative - sales - (cumulative - sales)[starts][group]
+    total = np.add.reduceat(sales, starts)[group] if len(style) else sales
+    pivotal = np.zeros(len(ean_sales), dtype=bool)
+    pivotal[order] = (sales > 0) & (before < share * total)
+    return pivotal
+
+
+@instrumented("ingest: size model")
+def build_size_model(df):
+    # df: one row per (Store, EAN) with Style, Size, Stock Qty, Sales Last Week and,
+    # optionally, EAN Code (else SKU, else Style + Size) and the style attributes
+    store, stores = pd.factorize(df["Store"])
+    ean, ean_values = pd.factorize(_ean_keys(df))
+    store = store.astype("int32")
+    ean = ean.astype("int32")
+    stock = df["Stock Qty"].fillna(0).to_numpy(dtype="int32")
+    sales = compact_quantity(df["Sales Last Week"]).to_numpy()
+
+    first = np.unique(ean, return_index=True)[1]
+    style, style_values = pd.factorize(df["Style"].to_numpy()[first])
+    styles = pd.DataFrame({"Style": style_values.astype(str)})
+    style_rows = first[np.unique(style, return_index=True)[1]]
+    for column in STYLE_ATTRIBUTES:
+        if column in df.columns:
+            styles[column] = df[column].to_numpy()[style_rows]
+
+    ean_sales = np.bincount(ean, weights=sales, minlength=len(ean_values))
+    codes = ean_values.map("-".join) if isinstance(ean_values, pd.MultiIndex) else ean_values
+    eans = pd.DataFrame({
+        "EAN Code": np.asarray(codes).astype(str),
+        "Size": df["Size"].to_numpy()[first].astype(str),
+        "Style Code": style.astype("int32"),
+        "Pivotal": pivotal_sizes(style, ean_sales),
+    })
+    return SizeModel(pd.Index(stores).astype(str), styles, eans, store, ean, stock, sales)
+
+
+# ------------------ SIZE SUGGESTIONS ----------------
+@instrumented("suggest: sizes")
+def suggest_sizes(model, max_qty=MAX_TRANSFER_QTY, min_donor_stock=MIN_DONOR_STOCK, pivotal_stock=PIVOTAL_STOCK):
+    # Same donor/receiver rule as compute_suggestions, applied per EAN, but a
+    # donor never gives a pivotal size below pivotal_stock (others below min_donor_stock)
+    if len(model) == 0:
+        return pd.DataFrame(columns=SIZE_SUGGESTION_COLUMNS)
+
+    pivotal = model.eans["Pivotal"].to_numpy()
+    floor = np.where(pivotal[model.ean], pivotal_stock, min_donor_stock)
+
+    order = np.lexsort((model.sales, model.ean))
+    sorted_ean = model.ean[order]
+    starts = np.flatnonzero(np.r_[True, sorted_ean[1:] != sorted_ean[:-1]])
+    ends = np.r_[starts[1:], len(order)] - 1
+    donor = order[starts]
+    receiver = order[ends]
+    qty = np.minimum(max_qty, model.stock[donor].astype("int64") - floor[donor])
+    keep = ((ends - starts) >= 1) & (model.sales[donor] < model.sales[receiver]) & (qty > 0)
+    donor, receiver, qty = donor[keep], receiver[keep], qty[keep]
+
+    ean = model.ean[donor]
+    style = model.eans["Style Code"].to_numpy()[ean]
+    result = pd.DataFrame({
+        "SKU": model.eans["EAN Code"].to_numpy()[ean],
+        "Product": model.styles["Style Desc" if "Style Desc" in model.styles else "Style"].to_numpy()[style],
+        "From": model.stores[model.store[donor]],
+        "To": model.stores[model.store[receiver]],
+        "Qty": qty,
+        "Style": model.styles["Style"].to_numpy()[style],
+        "Size": model.eans["Size"].to_numpy()[ean],
+        "Pivotal": pivotal[ean],
+        "Pre Stock": model.stock[donor],
+        "Post Stock": model.stock[donor] - qty,
+    })
+    result["Submitted At"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    result["Status"] = "Suggested"
+    return result
+
+
+_models = VersionedCache(build_size_model)
+
+
+def size_model_for(market, version, df):
+    return _models.get(market, version, df)
+
+
+# ------------------ MEMORY REPORT -------------------
+def memory_report(df):
+    # Bytes per row of the wide frame vs the coded model built from it
+    model = build_size_model(df)
+    wide = int(df.memory_usage(deep=True).sum())
+    return {
+        "rows": len(df),
+        "wide_bytes_per_row": wide / max(len(df), 1),
+        "model_bytes_per_row": model.nbytes() / max(len(df), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory per row of a size-level inventory, wide vs coded.")
+    parser.add_argument("inventory", help="size-level inventory CSV")
+    args = parser.parse_args(argv)
+
+    report = memory_report(pd.read_csv(args.inventory, dtype={"EAN Code": str}))
+    print(f"{report['rows']} rows: wide {report['wide_bytes_per_row']:.1f} B/row, "
+          f"coded {report['model_bytes_per_row']:.1f} B/row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import os
+
+import pyarrow.feather as feather
+
+from profiling import instrumented
+
+SNAPSHOT_DIR = "snapshots"
+
+
+# ------------------ COLUMNAR SNAPSHOTS --------------
+# Uploaded CSVs are converted once into uncompressed Arrow/Feather files.
+# Uncompressed files can be memory-mapped, so later loads only touch the
+# columns that are asked for.
+def snapshot_path(name):
+    return os.path.join(SNAPSHOT_DIR, f"{name}.feather")
+
+
+def has_snapshot(name):
+    return os.path.exists(snapshot_path(name))
+
+
+def snapshot_version(name):
+    # Modification time doubles as a cheap version tag for caches
+    return os.path.getmtime(snapshot_path(name)) if has_snapshot(name) else None
+
+
+@instrumented("persist: save snapshot")
+def save_snapshot(df, name):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = snapshot_path(name)
+    tmp = path + ".tmp"
+    feather.write_feather(df.reset_index(drop=True), tmp, compression="uncompressed")
+    os.replace(tmp, path)   # readers never see a half-written file
+    return path
+
+
+@instrumented("persist: load snapshot", rows=len)
+def load_snapshot(name, columns=None):
+    # Mapping the file is free; only the selected columns are materialised
+    table = feather.read_table(snapshot_path(name), memory_map=True)
+    if columns is not None:
+        table = table.select([c for c in columns if c in table.column_names])
+    return table.to_pandas()
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from inventory_cache import VersionedCache
+
+
+# ------------------ STORE PARTITIONS ----------------
+class StorePartitions:
+    # Row positions of every store in an inventory frame, so a store's slice is
+    # one take() instead of a scan of the whole market.
+
+    def __init__(self, df, positions=None):
+        self.df = df
+        if positions is None:
+            positions = {str(store): rows for store, rows in
+                         df.groupby("Store", observed=True, sort=False).indices.items()}
+        self.positions = positions
+
+    def extend(self, df):
+        # Index for a frame whose first len(self.df) rows are the old ones in the
+        # same order (what apply_receipts produces); only appended rows are grouped.
+        # Returns a new object so sessions reading the old one are unaffected.
+        start = len(self.df)
+        positions = dict(self.positions)
+        if len(df) > start:
+            appended = df["Store"].iloc[start:].astype(str).to_numpy()
+            for store, rows in pd.Series(appended).groupby(appended, sort=False).indices.items():
+                old = positions.get(store)
+                positions[store] = rows + start if old is None else np.concatenate([old, rows + start])
+        return StorePartitions(df, positions)
+
+    def stores(self):
+        return sorted(self.positions)
+
+    def slice(self, store):
+        rows = self.positions.get(str(store))
+        if rows is None:
+            return self.df.iloc[:0]
+        return self.df.iloc[rows]
+
+
+_partitions = VersionedCache(StorePartitions)
+
+
+def partitions_for(market, version, df):
+    return _partitions.get(market, version, df)
+
+
+def advance_partitions(market, previous, version, df):
+    # After receipts: carry the index over to the new version, but only when it
+    # was built for the frame the receipts were applied to (version previous);
+    # an index from any other upload would point at the wrong rows
+    cached = _partitions.peek(market)
+    if cached is not None and cached[0] == previous:
+        partitions = cached[1].extend(df)
+    else:
+        partitions = StorePartitions(df)
+    _partitions.put(market, version, partitions)
@@ -1,61 +1,30 @@
 import streamlit as st
 import pandas as pd
-import time
-import base64
-from pathlib import Path
+
+from assets import APP_CSS, header_html
+from batch import MARKETS, inventory_snapshot, recommendations_snapshot
+from health import HealthEngine
+from ingest import upload_id
+from job_views import job_progress
+from jobs import init_jobs, job_result, pipeline_job, submit_job
+from liquidation import plan_fingerprint, scores_for
+from movements import TOP_CORRIDORS, MovementMatrix, store_regions
+from snapshots import has_snapshot, load_snapshot, snapshot_version
+from suggestions import compute_suggestions
+from transfer_views import paged_dataframe
 
 # Set up the app
 st.set_page_config(page_title="Adidas S2S", layout="wide")
 
-# Load and encode logo image
-def get_base64_logo(img_path):
-    with open(img_path, "rb") as f:
-        data = f.read()
-    return base64.b64encode(data).decode()
-
-logo_base64 = get_base64_logo("Adidas_Logo.svg.png")  # Ensure this file is in the same folder
-
-# --- Adidas Logo and Title ---
-st.markdown(
-    f"""
-    <div style="text-align:center;">
-        <img src="data:image/png;base64,{logo_base64}" width="150"/>
-        <h1 style="font-family:Arial, sans-serif; margin-top:10px;">Adidas - Store to Store Transfer Stock Consolidation</h1>
-    </div>
-    """,
-    unsafe_allow_html=True
-)
-
-# --- Custom CSS ---
-st.markdown("""
-    <style>
-        .stButton>button {
-            border-radius: 8px;
-            background-color: #000000;
-            color: white;
-            padding: 0.6em 1.2em;
-            margin: 0.5em;
-            font-weight: 600;
-        }
-        .stRadio > div {
-            padding: 1em;
-            border: 1px solid #eee;
-            border-radius: 10px;
-        }
-        h1, h2, h3 {
-            color: #000000;
-            font-family: 'Helvetica Neue', sans-serif;
-        }
-        .css-1d391kg {
-            overflow-x: auto;
-        }
-        .stDataFrame {
-            overflow-x: auto;
-            width: 100% !important;
-            word-break: break-word;
-        }
-    </style>
-""", unsafe_allow_html=True)
+# --- Adidas Logo, Title and CSS (encoded once per process, see assets.py) ---
+st.markdown(header_html("Adidas - Store to Store Transfer Stock Consolidation"), unsafe_allow_html=True)
+st.markdown(APP_CSS, unsafe_allow_html=True)
+
+@st.cache_resource
+def setup_jobs():
+    init_jobs()
+
+setup_jobs()
 
 # --- Navigation logic ---
 if "step" not in st.session_state:
@@ -67,86 +36,155 @@ def next_step():
 def prev_step():
     st.session_state.step = max(1, st.session_state.step - 1)
 
+def movement_matrix():
+    # Built once per set of recommendations and shared by steps 3 and 4
+    results = st.session_state.get("pipeline_results")
+    if results is None:
+        return None
+    plan = results["recommendations"]
+    if st.session_state.get("movement_key") != id(plan):
+        st.session_state.movement_matrix = MovementMatrix(plan)
+        st.session_state.movement_key = id(plan)
+        st.session_state.pop("drilldown", None)
+    return st.session_state.movement_matrix
+
+def step_inventory(market):
+    # Uploaded inventory, else the one the nightly batch run left behind
+    inventory = st.session_state.get("inventory_data")
+    if inventory is None and has_snapshot(inventory_snapshot(market)):
+        inventory = load_snapshot(inventory_snapshot(market))
+    return inventory
+
+def step_inventory_version(market):
+    # Identity of that inventory without reading it: the upload's content hash, else
+    # the snapshot's version; None when there is neither
+    return st.session_state.get("inventory_upload") or snapshot_version(inventory_snapshot(market))
+
 # --- Step Pages ---
 if st.session_state.step == 1:
     st.header(" Select Market & Upload Store Nos")
-    market = st.selectbox("Select Market", ["Germany", "France", "UK"])
+    market = st.selectbox("Select Market", MARKETS, index=MARKETS.index(st.session_state.get("market", MARKETS[0])))
+    if st.session_state.get("market") != market:
+        st.session_state.pop("pipeline_results", None)
+    st.session_state.market = market
     store_file = st.file_uploader("Upload Store Numbers Excel", type=["xlsx"])
     if store_file:
         st.success("✅ Store file uploaded. Click Next to continue.")
+    inventory_file = st.file_uploader("Upload Inventory & Sales CSV", type=["csv"])
+    if inventory_file and st.session_state.get("inventory_upload") != upload_id(inventory_file):
+        st.session_state.inventory_data = pd.read_csv(inventory_file)
+        st.session_state.inventory_upload = upload_id(inventory_file)
+        st.session_state.pop("pipeline_results", None)
+        st.success("✅ Inventory file uploaded.")
 
 elif st.session_state.step == 2:
     st.header("Store to Store Transfer Stock Consolidation Preloading")
-    steps = [
-        "Pulling Sales Data...",
-        "Checking Store Capacity...",
-        "Processing Sales Duration for Store-Style Ranking...",
-        "Calculating Share of Business...",
-        "Evaluating Discount Benchmark for Liquidation...",
-        "Assessing Pivotal Size Availability...",
-        "Validating Minimum Live Days...",
-        "Calculating Transfer Cost...",
-        "Optimizing...",
-        "Generating Final Recommendations..."
-    ]
-    with st.spinner("🔄 Processing..."):
-        for step in steps:
-            st.markdown(f"🟢 {step}")
-            time.sleep(0.8)
-    st.success("✅ Processing Complete")
+    inventory = st.session_state.get("inventory_data")
+    market = st.session_state.get("market", MARKETS[0])
+    if "pipeline_results" not in st.session_state:
+        if inventory is None and has_snapshot(recommendations_snapshot(market)):
+            # Precomputed by the nightly batch run (batch.py)
+            st.session_state.pipeline_results = {"recommendations": load_snapshot(recommendations_snapshot(market))}
+        elif inventory is not None:
+            # Runs in the background; sessions running the same market, file contents and
+            # options share one job, and a finished one is reused only for identical input
+            options = {"partition_by": "Market"}
+            key = (market, st.session_state.get("inventory_upload"), sorted(options.items()))
+            job_id = submit_job("pipeline", key, pipeline_job, inventory, **options)
+            job = job_progress(job_id)
+            if job and job["status"] == "Done":
+                st.session_state.pipeline_results = {"recommendations": job_result(job_id)}
+            elif job and st.button("Retry"):
+                submit_job("pipeline", key, pipeline_job, inventory, reuse=False, **options)
+                st.rerun()
+
+    if "pipeline_results" in st.session_state:
+        st.success("✅ Processing Complete")
+        st.dataframe(st.session_state.pipeline_results["recommendations"], use_container_width=True)
+    else:
+        st.warning("⚠️ No inventory data found. Please upload it in Step 1")
 
 elif st.session_state.step == 3:
     st.header("Transfer Movement Summary")
-    summary_data = {
-        "From Store": ["Berlin FO", "Munich FO", "Nuremberg FO"],
-        "Berlin FO": ["", 29, 33],
-        "Munich FO": [40, "", 22],
-        "Nuremberg FO": [23, 13, ""]
-    }
-    summary_df = pd.DataFrame(summary_data)
-    summary_df.set_index("From Store", inplace=True)
-    st.dataframe(summary_df, use_container_width=True)
+    matrix = movement_matrix()
+    if matrix is None:
+        st.warning("⚠️ No transfer recommendations found. Please run Step 2 first")
+    else:
+        st.caption(f"{len(matrix):,} store-to-store corridors with transfers")
+        top_n = st.slider("Top corridors", min_value=5, max_value=100, value=TOP_CORRIDORS, step=5)
+        top = matrix.top(top_n)
+
+        inventory = st.session_state.get("inventory_data")
+        regions = store_regions(inventory) if inventory is not None else None
+        if regions is not None and st.checkbox("Cluster stores by region"):
+            st.dataframe(matrix.by_region(regions).pivot_table(index="From", columns="To", values="Qty",
+                                                               aggfunc="sum", fill_value=0),
+                         use_container_width=True)
+        else:
+            stores = pd.unique(pd.concat([top["From"], top["To"]]))
+            st.dataframe(matrix.pivot(stores), use_container_width=True)
+
+        st.dataframe(top, use_container_width=True)
+        corridor = st.selectbox("Drill down into corridor", [None] + list(zip(top["From"], top["To"])),
+                                format_func=lambda c: "All corridors" if c is None else f"{c[0]} → {c[1]}")
+        st.session_state.drilldown = corridor
 
 elif st.session_state.step == 4:
     st.header("Raw Transfer Data Stats")
-    raw_data = {
-        "Channel": ["FR"] * 5,
-        "FROM STORE": ["MUNICH FO"] * 5,
-        "TO STORE": ["BERLIN FO"] * 5,
-        "Style": ["EG4089", "FW2545", "S24039", "FW2545", "FU9609"],
-        "Parent Style": ["EG4089", "FW2545", "S24039", "FW2545", "FU9609"],
-        "Style Desc": ["TENSAUR C", "LITE RACER 2.0 K", "TENSAUR K", "LITE RACER 2.0 K", "STAN SMITH"],
-        "Brand": ["ADIDAS", "ADIDAS", "ADIDAS", "ADIDAS", "ADIDAS ORIGINALS"],
-        "Sport": ["RUNNING", "RUNNING", "RUNNING", "RUNNING", "ORIGINALS"],
-        "Gender": ["KIDS", "KIDS", "KIDS", "KIDS", "MEN"],
-        "Season": ["SS21", "FW20", "SS21", "FW20", "FW20"],
-        "Size": [1, 3, 4, 2, 9],
-        "EAN Code": ["4062053369004", "4062059375788", "4064044530110", "4062059375740", "4060518457129"],
-        "Pre Stock": [10, 12, 10, 3, 5],
-        "Post Stock": [0, 5, 0, 0, 0],
-        "Pull Back": [0, 0, 0, 0, 0]
-    }
-    raw_df = pd.DataFrame(raw_data)
-    st.dataframe(raw_df, use_container_width=True)
+    matrix = movement_matrix()
+    if matrix is None:
+        st.warning("⚠️ No transfer recommendations found. Please run Step 2 first")
+    elif st.session_state.get("drilldown"):
+        from_store, to_store = st.session_state.drilldown
+        st.subheader(f"{from_store} → {to_store}")
+        st.dataframe(matrix.lines_for(from_store, to_store), use_container_width=True)
+    else:
+        paged_dataframe("raw_transfers", matrix.lines)
+
+    market = st.session_state.get("market", MARKETS[0])
+    version = step_inventory_version(market) if matrix is not None else None
+    if version is not None:
+        st.subheader("Pull Back vs Liquidation")
+        # Scored once per inventory and plan, reading the inventory only then; the
+        # filters below only slice the cached table
+        scores = scores_for(market, version, lambda: step_inventory(market),
+                            st.session_state.pipeline_results["recommendations"])
+        columns = st.columns(max(len(scores.slice_columns), 1))
+        selected = {column: col.multiselect(column, scores.options(column), key=f"pull_back_{column}")
+                    for col, column in zip(columns, scores.slice_columns)}
+        table = scores.slice(**selected)
+        by = st.radio("Summarise by", ["Action"] + scores.slice_columns, horizontal=True)
+        st.dataframe(scores.summary(table, None if by == "Action" else by), use_container_width=True)
+        paged_dataframe("pull_back_scores", table[table["Action"] != "Keep"])
 
 elif st.session_state.step == 5:
     st.header("Health Improvement at Stores")
-    health_data = {
-        "Brand": ["ADIDAS"] * 13 + [" ", "ORIGINALS", " ", "", ""],
-        "Sport": [
-            "BASKETBALL", "CRICKET", "FIELD HOCKEY", "FOOTBALL/SOCCER", "HIKING", "INDOOR",
-            "OUTDOOR", "RUNNING", "SKATEBOARDING", "SWIM", "TENNIS", "TRAIL RUNNING", "TRAINING",
-            "Total", "ORIGINALS", "SKATEBOARDING", "Total", "Grand Total"
-        ],
-        "Pre S2S - Store Style Count": [40,4,7,185,21,3,34,1134,18,4,150,13,73,1686,347,4,351,2037],
-        "Post S2S - Store Style Count": [50,4,7,182,21,3,32,1118,20,4,168,14,59,1682,415,4,419,2101],
-        "Pre S2S Healthy Combinations": [26,2,4,108,16,1,11,670,11,0,83,11,51,994,181,0,181,1175],
-        "Post S2S Healthy Combinations": [37,2,4,138,20,1,13,763,13,0,99,14,44,1148,248,0,248,1396],
-        "Pre S2S - health%": ["65%","50%","57%","58%","76%","33%","32%","59%","61%","0%","55%","85%","70%","59%","52%","0%","52%","58%"],
-        "Post S2S - health%": ["74%","50%","57%","76%","95%","33%","41%","68%","65%","0%","59%","100%","75%","68%","60%","0%","59%","66%"]
-    }
-    health_df = pd.DataFrame(health_data)
-    st.dataframe(health_df,use_container_width=True)
+    market = st.session_state.get("market", MARKETS[0])
+    version = step_inventory_version(market)
+    results = st.session_state.get("pipeline_results")
+
+    if version is None or results is None:
+        st.warning("⚠️ No transfer recommendations found. Please run Step 2 first")
+    else:
+        # Recomputed when the inventory or the plan changes (a new upload, a Retry, a
+        # new nightly snapshot); the inventory is only read then
+        health_key = (market, version, plan_fingerprint(results["recommendations"]))
+        if st.session_state.get("health_key") != health_key:
+            inventory = step_inventory(market)
+            engine = HealthEngine(inventory)
+            st.session_state.health_reports = engine.compare({
+                "Recommended": results["recommendations"],
+                "Top-Seller Heuristic": compute_suggestions(inventory),
+            })
+            st.session_state.health_key = health_key
+
+        reports = st.session_state.health_reports
+        for tab, (name, report) in zip(st.tabs(list(reports)), reports.items()):
+            with tab:
+                health_df = report.copy()
+                for column in ["Pre S2S - health%", "Post S2S - health%"]:
+                    health_df[column] = health_df[column].map(lambda v: f"{v:.0f}%")
+                st.dataframe(health_df, use_container_width=True)
 
 elif st.session_state.step == 6:
     st.header("Accept Transfers")
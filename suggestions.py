@@ -0,0 +1,155 @@
+import threading
+
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from features import demand_rate
+from profiling import instrumented
+
+# Cap on units moved by a single suggested transfer
+MAX_TRANSFER_QTY = 10
+
+SUGGESTION_COLUMNS = ["SKU", "Product", "From", "To", "Qty", "Submitted At", "Status"]
+
+
+# ------------------ SUGGESTION ENGINE ---------------
+@instrumented("suggest: quick")
+def compute_suggestions(df, max_qty=MAX_TRANSFER_QTY):
+    # For every SKU pick the lowest-selling store as donor and the highest-selling
+    # store as receiver in one sorted pass instead of a per-SKU groupby loop.
+    if df.empty:
+        return pd.DataFrame(columns=SUGGESTION_COLUMNS)
+
+    codes, skus = pd.factorize(df["SKU"], sort=True)
+    rows = np.flatnonzero(codes >= 0)
+    codes = codes[rows]
+    sales = demand_rate(df)[rows]
+
+    # Stable sort by (SKU, sales): ties keep file order like sort_values did
+    order = np.lexsort((sales, codes))
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    ends = np.r_[starts[1:], len(order)] - 1
+
+    donor = order[starts]
+    receiver = order[ends]
+    keep = ((ends - starts) >= 1) & (sales[donor] < sales[receiver])
+    donor = rows[donor[keep]]
+    receiver = rows[receiver[keep]]
+
+    stock = df["Stock Qty"].to_numpy()[donor]
+    result = pd.DataFrame({
+        "SKU": skus.to_numpy()[sorted_codes[starts[keep]]],
+        "Product": df["Product"].to_numpy()[donor],
+        "From": df["Store"].to_numpy()[donor],
+        "To": df["Store"].to_numpy()[receiver],
+        "Qty": np.minimum(max_qty, stock),
+    })
+    result["Submitted At"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    result["Status"] = "Suggested"
+    return result
+
+
+# ------------------ INCREMENTAL INDEX ---------------
+FINGERPRINT_COLUMNS = ["Store", "SKU", "Product", "Stock Qty", "Sales Last Week", "Velocity"]
+
+
+def sku_fingerprints(df):
+    # Order-independent hash of every SKU's rows; a changed SKU gets a new value
+    columns = [c for c in FINGERPRINT_COLUMNS if c in df.columns]
+    rows = pd.util.hash_pandas_object(df[columns], index=False)
+    fingerprints = rows.groupby(df["SKU"], observed=True, sort=False).sum()
+    fingerprints.index = fingerprints.index.astype(str)
+    return fingerprints
+
+
+def _sku_mask(skus, wanted):
+    # Categorical SKUs are matched on their categories, not on every row
+    if isinstance(skus.dtype, pd.CategoricalDtype):
+        hit = skus.cat.categories.astype(str).isin(wanted)
+        codes = skus.cat.codes.to_numpy()
+        return np.append(hit, False)[codes]
+    return skus.astype(str).isin(wanted).to_numpy()
+
+
+MAX_DELTAS = 64      # touched versions remembered while no session asks for suggestions
+
+
+class SuggestionIndex:
+    # Caches suggestions per SKU for one inventory version. A receive that
+    # publishes a new version calls touch() with the SKUs it changed, and
+    # moving to that version recomputes only those SKUs. Any other new version
+    # (an upload, a snapshot reloaded after a batch receive) is diffed against
+    # the cached per-SKU fingerprints instead.
+
+    def __init__(self):
+        self._version = None
+        self._result = None
+        self._fingerprints = None
+        self._deltas = {}    # version -> (version it was made from, SKUs changed)
+        self._lock = threading.Lock()
+
+    def touch(self, skus, previous, version):
+        # version was made from previous by changing only these SKUs
+        with self._lock:
+            self._deltas[version] = (previous, {str(sku) for sku in skus})
+            while len(self._deltas) > MAX_DELTAS:
+                del self._deltas[next(iter(self._deltas))]
+
+    def _touched(self, version):
+        # SKUs changed between the cached version and this one when every step
+        # in between was touched, else None
+        dirty = set()
+        while version != self._version:
+            if version not in self._deltas:
+                return None
+            version, skus = self._deltas.pop(version)
+            dirty |= skus
+        return dirty
+
+    def suggestions(self, df, version):
+        with self._lock:
+            if self._result is not None and version == self._version:
+                return self._result
+            touched = self._touched(version) if self._result is not None else None
+            if self._result is None or self._fingerprints is None or df.empty:
+                # Nothing to diff against (first call, or the last version was empty)
+                self._result = compute_suggestions(df)
+                self._result["SKU"] = self._result["SKU"].astype(str)
+                self._fingerprints = sku_fingerprints(df) if not df.empty else None
+            elif touched is not None:
+                self._update(df, touched)
+            else:
+                self._refresh(df)
+            self._version = version
+            return self._result
+
+    def _refresh(self, df):
+        # Untracked version: every SKU's rows are hashed and compared
+        current = sku_fingerprints(df)
+        previous = self._fingerprints
+        common = current.index.intersection(previous.index)
+        changed = common[current[common].to_numpy() != previous[common].to_numpy()]
+        self._recompute(df, set(changed) | set(current.index.symmetric_difference(previous.index)), current)
+
+    def _update(self, df, dirty):
+        # Touched version: only the touched SKUs' rows are read and re-hashed
+        if not dirty:
+            return
+        subset = df[_sku_mask(df["SKU"], dirty)]
+        kept = self._fingerprints[~self._fingerprints.index.isin(dirty)]
+        self._recompute(subset, dirty, pd.concat([kept, sku_fingerprints(subset)]))
+
+    def _recompute(self, df, dirty, fingerprints):
+        self._fingerprints = fingerprints
+        if not dirty:
+            return
+        subset = df[_sku_mask(df["SKU"], dirty)]
+        fresh = compute_suggestions(subset)
+        fresh["SKU"] = fresh["SKU"].astype(str)
+        kept = self._result[~self._result["SKU"].isin(dirty)]
+        self._result = pd.concat([kept, fresh], ignore_index=True).sort_values("SKU", kind="stable", ignore_index=True)
+
+
+SUGGESTION_INDEX = SuggestionIndex()
@@ -0,0 +1,439 @@
+import os
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from profiling import instrumented
+
+DB_FILE = "store_transfer.db"
+TRANSFER_FILE = "transfer_requests.csv"
+
+# Columns added on top of the original transfers table
+EXTRA_COLUMNS = {
+    "product": "TEXT",
+    "submitted_at": "TEXT",
+    "submitted_by": "TEXT",
+    "version": "INTEGER NOT NULL DEFAULT 0",     # bumped on every status change
+}
+
+# Columns added on top of the original inventory table
+EXTRA_TABLE_COLUMNS = {
+    "inventory": {"store": "TEXT", "sales_last_week": "REAL NOT NULL DEFAULT 0"},
+}
+
+# transfers table column -> key used by the Streamlit apps
+FIELDS = {
+    "id": "ID",
+    "sku": "SKU",
+    "quantity": "Qty",
+    "from_location": "From",
+    "to_location": "To",
+    "status": "Status",
+    "product": "Product",
+    "submitted_at": "Submitted At",
+    "submitted_by": "Submitted By",
+    "version": "Version",
+}
+
+
+# ------------------ CONNECTION POOL -----------------
+POOL_SIZE = 8               # connections per server process and database file
+STATEMENT_CACHE = 128       # prepared statements kept per connection
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",      # readers run alongside a writer
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=30000",
+    "PRAGMA cache_size=-32000",     # 32 MB page cache per connection
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+]
+
+
+class ConnectionPool:
+    # Thread-safe pool of open connections. A connection is used by one thread
+    # at a time, so it can be shared across Streamlit session threads; SQL text
+    # is kept constant so each connection's statement cache stays warm.
+
+    def __init__(self, db_file, size=POOL_SIZE):
+        self.db_file = db_file
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_file, timeout=30, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._open()
+            try:
+                with conn:
+                    yield conn
+            finally:
+                self._idle.put(conn)      # rolled back already if the block raised
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool(db_file=DB_FILE):
+    # One pool per database file and process; forked workers open their own
+    key = os.path.abspath(db_file)
+    with _pools_lock:
+        current = _pools.get(key)
+        if current is None or current.pid != os.getpid():
+            current = _pools[key] = ConnectionPool(db_file)
+        return current
+
+
+def connect(db_file=DB_FILE):
+    # Pooled connection for one transaction: commits on success, rolls back on error
+    return pool(db_file).connection()
+
+
+@contextmanager
+def write_transaction(db_file=DB_FILE):
+    # Connection holding the database write lock from the start (BEGIN IMMEDIATE).
+    # Another process doing the same waits, and nothing written on the connection
+    # commits unless the whole block succeeds.
+    with connect(db_file) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+
+
+def init_store(db_file=DB_FILE):
+    with connect(db_file) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS transfers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sku TEXT NOT NULL,
+                quantity INTEGER NOT NULL,
+                from_location TEXT NOT NULL,
+                to_location TEXT NOT NULL,
+                status TEXT DEFAULT 'Pending'
+            )
+        """)
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(transfers)")}
+        for column, kind in EXTRA_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE transfers ADD COLUMN {column} {kind}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_transfers_status_to ON transfers (status, to_location)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_transfers_sku ON transfers (sku)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_transfers_status_from ON transfers (status, from_location)")
+        # Per-store inbound / outbound lists in id order, with or without a status
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_transfers_to ON transfers (to_location, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_transfers_from ON transfers (from_location, id)")
+
+        # users / inventory predate the apps; inventory gains a store column so
+        # it can be read one store at a time
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL,
+                role TEXT NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS inventory (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sku TEXT NOT NULL,
+                product TEXT NOT NULL,
+                stock_qty INTEGER NOT NULL,
+                status TEXT NOT NULL
+            )
+        """)
+        for table, columns in EXTRA_TABLE_COLUMNS.items():
+            existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for column, kind in columns.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_inventory_store_sku ON inventory (store, sku)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+
+def _to_request(row):
+    return {FIELDS[key]: row[key] for key in row.keys()}
+
+
+# ------------------ WRITES --------------------------
+INSERT_TRANSFER = ("INSERT INTO transfers (sku, quantity, from_location, to_location, status, product, "
+                   "submitted_at, submitted_by) VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+
+
+def _transfer_params(request):
+    return (
+        str(request["SKU"]),
+        int(request.get("Qty", request.get("Quantity", 0))),
+        request["From"],
+        request["To"],
+        request.get("Status", "Pending"),
+        request.get("Product"),
+        request.get("Submitted At", datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        request.get("Submitted By"),
+    )
+
+
+@instrumented("persist: add transfer", rows=lambda result: 1)
+def add_transfer(request, db_file=DB_FILE):
+    with connect(db_file) as conn:
+        return conn.execute(INSERT_TRANSFER, _transfer_params(request)).lastrowid
+
+
+@instrumented("persist: add transfers")
+def add_transfers(requests, db_file=DB_FILE):
+    # Bulk insert in one transaction, e.g. submitting a whole suggestion list
+    with connect(db_file) as conn:
+        conn.executemany(INSERT_TRANSFER, (_transfer_params(request) for request in requests))
+
+
+def update_status(transfer_id, status, db_file=DB_FILE):
+    update_statuses([transfer_id], status, db_file=db_file)
+
+
+@instrumented("persist: status update")
+def update_statuses(transfer_ids, status, db_file=DB_FILE):
+    # Unconditional overwrite for admin fixes and migrations; the apps go through
+    # transition(). The version still moves so readers holding the row see a conflict.
+    with connect(db_file) as conn:
+        conn.executemany("UPDATE transfers SET status = ?, version = version + 1 WHERE id = ?",
+                         [(status, int(transfer_id)) for transfer_id in transfer_ids])
+
+
+# ------------------ STATE MACHINE -------------------
+# Target status -> the only status it can be reached from:
+# Pending -> Approved / Denied, Approved -> Received
+TRANSITIONS = {
+    "Approved": "Pending",
+    "Denied": "Pending",
+    "Received": "Approved",
+}
+
+CAS_UPDATE = ("UPDATE transfers SET status = ?, version = version + 1 "
+              "WHERE id = ? AND status = ? AND version = ?")
+CAS_UPDATE_ANY_VERSION = "UPDATE transfers SET status = ?, version = version + 1 WHERE id = ? AND status = ?"
+
+
+def versions(requests):
+    # (ID, Version) pairs for rows as the caller read them, ready for transition()
+    return [(request["ID"], request.get("Version")) for request in requests]
+
+
+@instrumented("persist: transition")
+def transition(transfers, status, db_file=DB_FILE, conn=None):
+    # Compare-and-swap status change for a batch of transfers, in one write
+    # transaction (the caller's, when conn is given). transfers holds IDs or
+    # (ID, Version) pairs: a row moves only while it is still in the source state
+    # and, when given, at the version the caller read, so parallel approvers can
+    # never overwrite each other.
+    # Returns (moved IDs, conflicting IDs); conflicts are left untouched.
+    if status not in TRANSITIONS:
+        raise ValueError(f"Unknown transition to '{status}'. Allowed: {', '.join(TRANSITIONS)}")
+    if conn is None:
+        with write_transaction(db_file) as conn:
+            return _transition(conn, transfers, status)
+    return _transition(conn, transfers, status)
+
+
+def _transition(conn, transfers, status):
+    source = TRANSITIONS[status]
+    moved, conflicts = [], []
+    for item in transfers:
+        transfer_id, version = item if isinstance(item, tuple) else (item, None)
+        if version is None or pd.isna(version):
+            cursor = conn.execute(CAS_UPDATE_ANY_VERSION, (status, int(transfer_id), source))
+        else:
+            cursor = conn.execute(CAS_UPDATE, (status, int(transfer_id), source, int(version)))
+        (moved if cursor.rowcount == 1 else conflicts).append(int(transfer_id))
+    return moved, conflicts
+
+
+# ------------------ READS ---------------------------
+def _where(status=None, to_location=None, from_location=None, exclude_status=None, store=None, sku=None,
+           date_from=None, date_to=None):
+    # WHERE clause over the indexed columns; dates filter submitted_at (inclusive)
+    clauses, params = [], []
+    if status is not None:
+        clauses.append("status = ?")
+        params.append(status)
+    if to_location is not None:
+        clauses.append("to_location = ?")
+        params.append(to_location)
+    if from_location is not None:
+        clauses.append("from_location = ?")
+        params.append(from_location)
+    if exclude_status is not None:
+        clauses.append("status != ?")
+        params.append(exclude_status)
+    if store is not None:
+        clauses.append("(from_location = ? OR to_location = ?)")
+        params.extend([store, store])
+    if sku is not None:
+        clauses.append("sku = ?")
+        params.append(str(sku))
+    if date_from is not None:
+        clauses.append("submitted_at >= ?")
+        params.append(date_from.strftime("%Y-%m-%d"))
+    if date_to is not None:
+        clauses.append("submitted_at < ?")
+        params.append((date_to + timedelta(days=1)).strftime("%Y-%m-%d"))
+    return (f" WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+
+def list_transfers(db_file=DB_FILE, **filters):
+    where, params = _where(**filters)
+    with connect(db_file) as conn:
+        rows = conn.execute(f"SELECT * FROM transfers{where} ORDER BY id", params).fetchall()
+    return [_to_request(row) for row in rows]
+
+
+def count_transfers(db_file=DB_FILE, **filters):
+    where, params = _where(**filters)
+    with connect(db_file) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM transfers{where}", params).fetchone()[0]
+
+
+def query_transfers(page=0, page_size=50, db_file=DB_FILE, **filters):
+    # One page of matching requests, oldest first
+    where, params = _where(**filters)
+    with connect(db_file) as conn:
+        rows = conn.execute(f"SELECT * FROM transfers{where} ORDER BY id LIMIT ? OFFSET ?",
+                            params + [page_size, page * page_size]).fetchall()
+    return [_to_request(row) for row in rows]
+
+
+# ------------------ CSV MIGRATION -------------------
+def migrate_csv(csv_file=TRANSFER_FILE, db_file=DB_FILE):
+    # One-shot import of the legacy CSV; the file is renamed so it never loads twice
+    if not os.path.exists(csv_file):
+        return 0
+    df = pd.read_csv(csv_file)
+    # Both legacy apps wrote this file, one as Qty and one as Quantity; rows with neither are dropped
+    for column in ["Qty", "Quantity", "Product", "Submitted At", "Submitted By"]:
+        if column not in df.columns:
+            df[column] = None
+    df["Qty"] = df["Qty"].fillna(df["Quantity"])
+    df = df[df["Qty"].notna()].drop(columns="Quantity")
+    df = df.astype(object).where(df.notna(), None)
+    rows = [
+        (str(r["SKU"]), int(r["Qty"]), r["From"], r["To"], r["Status"], r["Product"], r["Submitted At"], r["Submitted By"])
+        for r in df.to_dict("records")
+    ]
+    with connect(db_file) as conn:
+        conn.executemany(INSERT_TRANSFER, rows)
+    os.replace(csv_file, csv_file + ".migrated")
+    return len(rows)
+
+
+# ------------------ STORE INVENTORY -----------------
+# inventory table column -> inventory DataFrame column
+INVENTORY_FIELDS = {
+    "store": "Store",
+    "sku": "SKU",
+    "product": "Product",
+    "stock_qty": "Stock Qty",
+    "sales_last_week": "Sales Last Week",
+    "status": "Status",
+}
+DEFAULT_INVENTORY_STATUS = "Active"
+STORE_CACHE_SIZE = 64       # store inventories kept per process
+
+_store_cache = OrderedDict()     # (db, store, version) -> DataFrame
+_store_cache_lock = threading.Lock()
+
+
+def inventory_version(db_file=DB_FILE):
+    with connect(db_file) as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'inventory_version'").fetchone()
+    return row[0] if row else 0
+
+
+def inventory_source(db_file=DB_FILE):
+    # Snapshot version the table mirrors, or None when it is not known to match any
+    with connect(db_file) as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'inventory_source'").fetchone()
+    return row[0] if row else None
+
+
+@instrumented("persist: save inventory")
+def save_inventory(df, stores=None, db_file=DB_FILE, conn=None, source=None, based_on=None):
+    # Replaces the inventory (or only the given stores) with one executemany,
+    # then bumps the version so per-store caches reload. With conn, the write
+    # joins the caller's transaction. source is the snapshot version the rows
+    # come from: a full write records it, a per-store write carries it forward
+    # only while the rest of the table mirrors based_on. Anything else leaves
+    # the table with no known source.
+    rows = pd.DataFrame({
+        column: (df[name].astype(str) if name in ("Store", "SKU") else df[name]) if name in df.columns else None
+        for column, name in INVENTORY_FIELDS.items()
+    })
+    rows["product"] = rows["product"].fillna("").astype(str)
+    rows["stock_qty"] = rows["stock_qty"].fillna(0).astype("int64")
+    rows["sales_last_week"] = rows["sales_last_week"].fillna(0).astype("float64")   # REAL: fractional sales are kept
+    rows["status"] = rows["status"].fillna(DEFAULT_INVENTORY_STATUS).astype(str)
+    if conn is None:
+        with connect(db_file) as conn:
+            _write_inventory(conn, rows, stores, source, based_on)
+    else:
+        _write_inventory(conn, rows, stores, source, based_on)
+
+
+def _write_inventory(conn, rows, stores, source, based_on):
+    current = conn.execute("SELECT value FROM meta WHERE key = 'inventory_source'").fetchone()
+    if source is not None and (stores is None or (current is not None and current[0] == based_on)):
+        conn.execute("INSERT INTO meta (key, value) VALUES ('inventory_source', ?) "
+                     "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (source,))
+    else:
+        conn.execute("DELETE FROM meta WHERE key = 'inventory_source'")
+    if stores is None:
+        conn.execute("DELETE FROM inventory")
+    else:
+        conn.executemany("DELETE FROM inventory WHERE store = ?", [(str(store),) for store in stores])
+    conn.executemany(
+        "INSERT INTO inventory (store, sku, product, stock_qty, sales_last_week, status) VALUES (?, ?, ?, ?, ?, ?)",
+        rows[list(INVENTORY_FIELDS)].itertuples(index=False, name=None),
+    )
+    conn.execute("INSERT INTO meta (key, value) VALUES ('inventory_version', 1) "
+                 "ON CONFLICT(key) DO UPDATE SET value = value + 1")
+
+
+def load_store_inventory(store, db_file=DB_FILE):
+    # One store's rows through the (store, sku) index, cached until the inventory changes
+    key = (os.path.abspath(db_file), str(store), inventory_version(db_file))
+    with _store_cache_lock:
+        if key in _store_cache:
+            _store_cache.move_to_end(key)
+            return _store_cache[key].copy(deep=False)
+    with connect(db_file) as conn:
+        rows = conn.execute(f"SELECT {', '.join(INVENTORY_FIELDS)} FROM inventory WHERE store = ? ORDER BY sku",
+                            (str(store),)).fetchall()
+    df = pd.DataFrame([tuple(row) for row in rows], columns=list(INVENTORY_FIELDS.values()))
+    if (df["Sales Last Week"] % 1 == 0).all():
+        df["Sales Last Week"] = df["Sales Last Week"].astype("int64")   # whole-unit sales read back as integers
+    with _store_cache_lock:
+        _store_cache[key] = df
+        while len(_store_cache) > STORE_CACHE_SIZE:
+            _store_cache.popitem(last=False)
+    return df.copy(deep=False)
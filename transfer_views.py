@@ -0,0 +1,73 @@
+import math
+
+import pandas as pd
+import streamlit as st
+
+from transfer_store import count_transfers, query_transfers, transition, versions
+
+PAGE_SIZE = 50
+
+
+# ------------------ FILTERS -------------------------
+def transfer_filters(key):
+    # Store / SKU / date filters, applied in the database query
+    with st.expander("🔎 Filters"):
+        col1, col2, col3 = st.columns(3)
+        store = col1.text_input("Store", key=f"{key}_store")
+        sku = col2.text_input("SKU", key=f"{key}_sku")
+        dates = col3.date_input("Submitted between", value=[], key=f"{key}_dates")
+    filters = {"store": store or None, "sku": sku or None}
+    if len(dates) == 2:
+        filters["date_from"], filters["date_to"] = dates
+    return filters
+
+
+# ------------------ PAGINATION ----------------------
+def paged_transfers(key, page_size=PAGE_SIZE, **filters):
+    # Fetches only the page being shown, plus an indexed count for the pager
+    total = count_transfers(**filters)
+    pages = max(1, math.ceil(total / page_size))
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+    st.caption(f"{total} request(s)")
+    return query_transfers(page=page - 1, page_size=page_size, **filters)
+
+
+# ------------------ BULK APPROVAL -------------------
+def bulk_approval(key, rows):
+    # One editable table with a selection column instead of an expander per request.
+    # Decisions are compare-and-swapped against the version each row was read at,
+    # so a request another approver already decided is reported, not overwritten.
+    df = pd.DataFrame(rows)
+    df.insert(0, "Select", False)
+    edited = st.data_editor(df, hide_index=True, key=f"{key}_editor",
+                            disabled=[c for c in df.columns if c != "Select"])
+    selected = versions(edited[edited["Select"]].to_dict("records"))
+
+    col1, col2 = st.columns(2)
+    for col, status, label in ((col1, "Approved", "Approve"), (col2, "Denied", "Deny")):
+        if col.button(f"{label} Selected ({len(selected)})", key=f"{key}_{label.lower()}", disabled=not selected):
+            moved, conflicts = transition(selected, status)
+            st.session_state[f"{key}_outcome"] = (status, len(moved), len(conflicts))
+            st.rerun()
+
+    outcome = st.session_state.pop(f"{key}_outcome", None)
+    if outcome:
+        status, moved, conflicts = outcome
+        st.success(f"{moved} request(s) {status.lower()}.")
+        if conflicts:
+            st.warning(f"{conflicts} request(s) were changed by another approver and left as they are.")
+
+
+# ------------------ LARGE TABLES --------------------
+def paged_dataframe(key, df, page_size=PAGE_SIZE):
+    # Sends one page of a large frame to the browser instead of every row; returns that page
+    pages = max(1, math.ceil(len(df) / page_size))
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+    st.caption(f"{len(df):,} row(s)")
+    shown = df.iloc[(page - 1) * page_size:page * page_size]
+    st.dataframe(shown)
+    return shown